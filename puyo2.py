@@ -1,17 +1,12 @@
 import sys
 import random
 import math
-import numpy as np
-from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QLabel
+from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget
 from PyQt5.QtGui import QPainter, QColor, QFont, QPen, QBrush, QLinearGradient
 from PyQt5.QtCore import Qt, QTimer, QPoint, QRect
-
-# TTS機能のインポート
-try:
-    import pyttsx3
-    has_tts = True
-except ImportError:
-    has_tts = False
+from puyo_labeling import ConnectedComponents
+import puyo_voice
+from puyo_voice import CHAIN_VOICES, has_tts
 
 # 定数
 GRID_WIDTH = 6
@@ -45,26 +40,6 @@ PUYO_COLOR_NAMES = {
     str(YELLOW.getRgb()): "黄"
 }
 
-# 連鎖ボイス
-CHAIN_VOICES = {
-    2: "ファイヤー",
-    3: "アイスストーム",
-    4: "ダイアキュート",
-    5: "ばよえーん",
-    6: "イレブンチェーン",
-    7: "マジカルフィーバー",
-    8: "ブレインダンプ",
-    9: "ジュゲム",
-    10: "バイオレットハイ",
-    11: "ミラクルボンバー",
-    12: "ファンタスティック"
-}
-
-# TTS初期化
-if has_tts:
-    tts_engine = pyttsx3.init()
-    tts_engine.setProperty('rate', 150)
-
 # ぷよぷよのクラス
 class Puyo:
     def __init__(self, x, y, color):
@@ -73,7 +48,6 @@ class Puyo:
         self.color = color
         self.falling = True
         self.connected = False
-        self.checked = False
         self.visual_y = y  # 表示上の位置
         self.target_y = y  # 目標位置
         self.eyes_open = True  # 目の開閉状態
@@ -309,6 +283,7 @@ class PuyoPair:
 # ゲームロジッククラス
 class PuyoGameLogic:
     def __init__(self):
+        self.components = ConnectedComponents(GRID_WIDTH, GRID_HEIGHT)  # 連結判定用（バッファを使い回す）
         self.reset()
     
     def reset(self):
@@ -350,20 +325,7 @@ class PuyoGameLogic:
     
     def handle_floating_puyos(self):
         # 横に置いて空中に浮いている状態のぷよを落とす
-        puyo_dropped = True
-        
-        while puyo_dropped:
-            puyo_dropped = False
-            for y in range(GRID_HEIGHT - 2, -1, -1):
-                for x in range(GRID_WIDTH):
-                    if self.grid[y][x] is not None and self.grid[y + 1][x] is None:
-                        # 下が空いている場合は落とす
-                        self.grid[y + 1][x] = self.grid[y][x]
-                        self.grid[y + 1][x].y = y + 1
-                        self.grid[y + 1][x].target_y = y + 1  # 目標位置を更新
-                        self.grid[y][x] = None
-                        puyo_dropped = True
-                        self.fall_animation_in_progress = True  # アニメーション中フラグをセット
+        self.fall_puyos()
     
     def check_game_over(self):
         # 上部の行に固定されたぷよがあるかチェック
@@ -389,20 +351,11 @@ class PuyoGameLogic:
                 self.check_game_over()
     
     def check_matches(self):
-        # 全てのぷよのcheckedフラグをリセット
-        for y in range(GRID_HEIGHT):
-            for x in range(GRID_WIDTH):
-                if self.grid[y][x] is not None:
-                    self.grid[y][x].checked = False
-        
+        # 4つ以上連結したぷよを1回の走査でまとめて探す
+        group_count = self.components.label(self.grid)
         groups = []
-        # 4つ以上連結したぷよを探す
-        for y in range(GRID_HEIGHT):
-            for x in range(GRID_WIDTH):
-                if self.grid[y][x] is not None and not self.grid[y][x].checked:
-                    group = self.find_connected_puyos(x, y, self.grid[y][x].color)
-                    if len(group) >= 4:
-                        groups.append(group)
+        for i in range(group_count):
+            groups.append([self.grid[y][x] for x, y in self.components.iter_group(i)])
         
         # 連鎖があればぷよを消して得点計算
         if groups:
@@ -474,43 +427,31 @@ class PuyoGameLogic:
             self.chain_count = 0
             return False
     
-    def find_connected_puyos(self, x, y, color):
-        if (y < 0 or y >= GRID_HEIGHT or x < 0 or x >= GRID_WIDTH or 
-                self.grid[y][x] is None or self.grid[y][x].checked or 
-                self.grid[y][x].color != color):
-            return []
-        
-        self.grid[y][x].checked = True
-        result = [self.grid[y][x]]
-        
-        # 上下左右を確認
-        directions = [(0, -1), (1, 0), (0, 1), (-1, 0)]
-        for dx, dy in directions:
-            result.extend(self.find_connected_puyos(x + dx, y + dy, color))
-        
-        return result
-    
     def fall_puyos(self):
-        # 論理的な落下処理
-        moved = False
-        for y in range(GRID_HEIGHT - 2, -1, -1):
-            for x in range(GRID_WIDTH):
-                if self.grid[y][x] is not None and self.grid[y + 1][x] is None:
-                    # 論理的な位置を更新
-                    self.grid[y + 1][x] = self.grid[y][x]
-                    self.grid[y + 1][x].y = y + 1
-                    self.grid[y + 1][x].target_y = y + 1  # 目標位置を設定
+        """各列を下から1回走査して詰め、(ぷよ, 落下距離) のリストを返す"""
+        drops = []
+        for x in range(GRID_WIDTH):
+            land = GRID_HEIGHT - 1  # 次のぷよが止まる行
+            for y in range(GRID_HEIGHT - 1, -1, -1):
+                puyo = self.grid[y][x]
+                if puyo is None:
+                    continue
+                if y != land:
+                    # 論理的な位置を更新し、visual_y から落下アニメーションさせる
+                    self.grid[land][x] = puyo
                     self.grid[y][x] = None
-                    moved = True
-                    self.fall_animation_in_progress = True  # アニメーション中フラグをセット
-        
-        return moved
+                    puyo.y = land
+                    puyo.target_y = land
+                    drops.append((puyo, land - y))
+                land -= 1
+        
+        if drops:
+            self.fall_animation_in_progress = True  # アニメーション中フラグをセット
+        return drops
     
     def play_chain_voice(self, chain_count):
-        if chain_count in CHAIN_VOICES and has_tts:
-            voice = CHAIN_VOICES[chain_count]
-            tts_engine.say(voice)
-            tts_engine.runAndWait()
+        # 読み上げは別スレッドで行う（ゲームループは待たない）
+        puyo_voice.play_chain_voice(chain_count)
     
     def handle_key_press(self, key):
         if self.falling_puyos or self.game_over or self.waiting_for_pop or self.fall_animation_in_progress:
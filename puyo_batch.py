@@ -0,0 +1,83 @@
+# AIの配置候補をNumPyでまとめて評価するモジュール
+# 全候補（列×回転）の盤面を積み重ねた配列で、落下位置・隣接数・高さ・中央ボーナスを一度に計算する
+import numpy as np
+from puyo_bitboard import GRID_WIDTH, GRID_HEIGHT, COLUMN_BITS
+
+# 候補の並び: index = column * 4 + rotation（AIPlayer.decide_next_move と同じ順番）
+_COLUMNS = np.repeat(np.arange(GRID_WIDTH), 4)
+_ROTATIONS = np.tile(np.arange(4), GRID_WIDTH)
+_DX = np.array([0, 1, 0, -1])[_ROTATIONS]   # 2つ目のぷよの横方向のずれ
+_VERTICAL = _DX == 0                        # 縦置き（上・下）かどうか
+_FIRST_BELOW = _ROTATIONS == 2              # 縦置きで1つ目のぷよが下になるか（回転2）
+_X1 = _COLUMNS
+_X2 = _COLUMNS + _DX
+# 盤外にはみ出す候補（右端の右置き、左端の左置き）
+_IN_BOUNDS = (_X2 >= 0) & (_X2 < GRID_WIDTH)
+_X2_SAFE = np.clip(_X2, 0, GRID_WIDTH - 1)
+_INDEX = np.arange(len(_COLUMNS))
+
+# 中央配置のボーナス（候補ごとに固定）
+_CENTER = GRID_WIDTH / 2
+_CENTER_BONUS = (_CENTER - np.abs(_X1 - _CENTER)) + (_CENTER - np.abs(_X2 - _CENTER))
+
+_BOARD_BYTES = (GRID_WIDTH * COLUMN_BITS + 7) // 8
+
+
+def mask_planes(masks):
+    """ビットボードのマスクの列を (盤面, x, 下からの行) のbool配列に展開する"""
+    raw = np.frombuffer(b"".join(mask.to_bytes(_BOARD_BYTES, "little") for mask in masks), dtype=np.uint8)
+    bits = np.unpackbits(raw.reshape(len(masks), _BOARD_BYTES), axis=1, bitorder="little")
+    return bits[:, :GRID_WIDTH * COLUMN_BITS].reshape(len(masks), GRID_WIDTH, COLUMN_BITS)[:, :, :GRID_HEIGHT].astype(bool)
+
+
+def _stack(planes):
+    """盤面ごとに候補の数だけ積み重ねる（隣接数を数えやすいよう周囲に1マスの余白を付ける）"""
+    stack = np.zeros((len(planes), len(_INDEX), GRID_WIDTH + 2, GRID_HEIGHT + 2), dtype=np.int8)
+    stack[:, :, 1:-1, 1:-1] = planes[:, None]
+    return stack
+
+
+def _neighbor_counts(stack, boards, x, row):
+    """積み重ねた盤面の (x, row) の上下左右にある同色ぷよの数（余白の分だけ座標をずらして参照する）"""
+    candidates = _INDEX[None]
+    x = x + 1
+    row = row + 1
+    return (stack[boards, candidates, x - 1, row] + stack[boards, candidates, x + 1, row] +
+            stack[boards, candidates, x, row - 1] + stack[boards, candidates, x, row + 1])
+
+
+def evaluate_boards(boards, color1, color2):
+    """複数の盤面について全候補の評価値を (盤面数, 候補数) の配列で返す（置けない候補は-inf）"""
+    occupied = mask_planes([board.occupied for board in boards])
+
+    # 各列の落下位置（下からの行）= 積まれている高さ
+    heights = occupied.sum(axis=2)
+
+    # 出現位置（一番上の行とその下）が空いているか
+    top_free = ~occupied[:, :, GRID_HEIGHT - 1]
+    second_free = ~occupied[:, :, GRID_HEIGHT - 2]
+    valid = _IN_BOUNDS & top_free[:, _X1] & np.where(_VERTICAL, second_free[:, _X1], top_free[:, _X2_SAFE])
+
+    # 落下後の行（縦置きは下になる方を列に乗せてから、もう一方を積む）
+    row1 = heights[:, _X1] + (_VERTICAL & ~_FIRST_BELOW)
+    row2 = heights[:, _X2_SAFE] + _FIRST_BELOW
+    row1 = np.minimum(row1, GRID_HEIGHT - 1)
+    row2 = np.minimum(row2, GRID_HEIGHT - 1)
+
+    # 候補ごとの盤面を積み重ねて、置いたぷよを書き込む
+    index = np.arange(len(boards))[:, None]
+    stack1 = _stack(mask_planes([board.colors[color1] for board in boards]))
+    stack2 = stack1 if color1 == color2 else _stack(mask_planes([board.colors[color2] for board in boards]))
+    stack1[index, _INDEX, _X1 + 1, row1 + 1] = 1
+    stack2[index, _INDEX, _X2_SAFE + 1, row2 + 1] = 1
+
+    # 周囲の同色ぷよの数
+    neighbors1 = _neighbor_counts(stack1, index, _X1, row1)
+    neighbors2 = _neighbor_counts(stack2, index, _X2_SAFE, row2)
+
+    # 高さに対するペナルティ（下からの行 + 1 = GRID_HEIGHT - y）
+    height_penalty = (row1 + 1) + (row2 + 1)
+
+    scores = (neighbors1 + neighbors2) * 10 - height_penalty * 2 + _CENTER_BONUS
+    return np.where(valid, scores, -np.inf)
+
@@ -0,0 +1,282 @@
+# ぷよぷよのエンジンと描画のベンチマーク
+# 固定シードの盤面（空・まばら・満杯近く・8連鎖）で主な処理の時間を測り、
+# コミット間で比較できるようにJSONで出力する
+# 例: python puyo_bench.py --json before.json  →  python puyo_bench.py --compare before.json
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+
+import puyo_core
+from puyo_bitboard import GRID_WIDTH, GRID_HEIGHT, NUM_COLORS, BitBoard, cell_bit
+from puyo_labeling import ConnectedComponents
+
+BENCH_SEED = 20240601  # ゲームロジック（ツモ・AI）のシード
+DEFAULT_REPEAT = 200  # 1つのベンチマークの計測回数
+WARMUP = 3  # 計測前の空回し回数
+FRAME_DT = 1 / 60
+
+# 8連鎖が起きる盤面（上から1行ずつ、R/G/B/Y = 色インデックス0〜3）
+CHAIN_ROWS = (
+    "......",
+    "......",
+    ".Y..RG",
+    ".Y..YY",
+    "YRGRRR",
+    "BBBRYY",
+    "YRGBGY",
+    "GGYRGG",
+    "RGBBRR",
+    "GRYBRY",
+    "GGYGBB",
+    "RRYBYY",
+)
+
+
+def stable_rows(seed, min_height, max_height):
+    """4つ以上つながらないようにランダムに積んだ盤面を作る（同じシードなら同じ盤面）"""
+    rng = random.Random(seed)
+    board = BitBoard()
+    for x in range(GRID_WIDTH):
+        for row in range(rng.randint(min_height, max_height)):
+            y = GRID_HEIGHT - 1 - row
+            colors = list(range(NUM_COLORS))
+            rng.shuffle(colors)
+            for color in colors:
+                candidate = board.copy()
+                candidate.set(x, y, color)
+                if not candidate.find_groups():
+                    board = candidate
+                    break
+            else:
+                break
+    return tuple("".join("." if board.get(x, y) is None else "RGBY"[board.get(x, y)]
+                         for x in range(GRID_WIDTH)) for y in range(GRID_HEIGHT))
+
+
+# 盤面のフィクスチャ（空から満杯近くまで）
+FIXTURES = {
+    "empty": ("......",) * GRID_HEIGHT,
+    "sparse": stable_rows(1, 1, 4),
+    "near_full": stable_rows(2, 9, 10),
+    "chain": CHAIN_ROWS,
+}
+
+
+def load_fixture(game_logic, rows):
+    """ゲームロジックの盤面をフィクスチャの内容にする（ペアが参照する盤面はそのまま使う）"""
+    game_logic.board.remove(game_logic.board.occupied)
+    game_logic.cells.clear()
+    for y, row in enumerate(rows):
+        for x, char in enumerate(row):
+            if char == ".":
+                continue
+            color = "RGBY".index(char)
+            game_logic.board.set(x, y, color)
+            game_logic.cells.place(x, y, color)
+    game_logic.touched = game_logic.board.occupied  # 全部のマスを次の check_matches() で調べる
+    game_logic.recount_heights()
+    return game_logic
+
+
+def make_logic(rows, logic_class=puyo_core.PuyoGameLogic):
+    return load_fixture(logic_class(seed=BENCH_SEED), rows)
+
+
+def punch_floor(game_logic):
+    """一番下の行を消して、その上のぷよをすべて浮かせる"""
+    y = GRID_HEIGHT - 1
+    mask = 0
+    for x in range(GRID_WIDTH):
+        mask |= cell_bit(x, y)
+        game_logic.cells.remove(x, y)
+    game_logic.board.remove(mask)
+    game_logic.recount_heights()
+    return game_logic
+
+
+# ベンチマーク: フィクスチャを受け取り、計測のたびに呼ぶ準備関数を返す
+# 準備関数は計測する処理（引数なしの関数）を返す。準備にかかる時間は計測に含めない
+def bench_check_matches(rows):
+    return lambda: make_logic(rows).check_matches
+
+
+def bench_check_matches_landing(rows):
+    # ペアが着地した直後と同じく、中央2列の一番上のぷよだけが変化したマスになっている状態
+    def setup():
+        game_logic = make_logic(rows)
+        board = game_logic.board
+        game_logic.touched = 0
+        for x in (GRID_WIDTH // 2 - 1, GRID_WIDTH // 2):
+            y = board.drop_row(x) + 1
+            if y < GRID_HEIGHT:
+                game_logic.touched |= cell_bit(x, y)
+        return game_logic.check_matches
+    return setup
+
+
+def bench_find_groups(rows):
+    # 連結ぷよ探索（旧 find_connected_puyos 相当）のビットボード版
+    board = make_logic(rows).board
+    return lambda: board.find_groups
+
+
+def bench_label_components(rows):
+    # 連結ぷよ探索の puyo2.py 版（Puyoオブジェクトのグリッドを走査）
+    grid = make_logic(rows).grid
+    components = ConnectedComponents()
+    return lambda: (lambda: components.label(grid))
+
+
+def bench_fall_puyos(rows):
+    return lambda: punch_floor(make_logic(rows)).fall_puyos
+
+
+def bench_handle_floating_puyos(rows):
+    return lambda: punch_floor(make_logic(rows)).handle_floating_puyos
+
+
+def bench_decide_next_move(rows, search_depth=1):
+    def setup():
+        # 置換表を持ち越さないよう毎回新しいAIで測る（時間切れで結果が変わらないよう上限なし）
+        ai_player = puyo_core.AIPlayer(make_logic(rows), search_depth=search_depth,
+                                       time_budget_ms=float("inf"), seed=BENCH_SEED)
+        return ai_player.decide_next_move
+    return setup
+
+
+def bench_decide_next_move_2ply(rows):
+    return bench_decide_next_move(rows, search_depth=2)
+
+
+def bench_update_animations(rows):
+    def setup():
+        game_logic = make_logic(rows)
+        game_logic.chain_count = 2  # 星エフェクトも出るようにする
+        game_logic.check_matches()
+        return lambda: game_logic.update_animations(FRAME_DT)
+    return setup
+
+
+def bench_paint_event(rows):
+    # 画面なしのQtで対戦画面全体の paintEvent を測る
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    import puyo3
+
+    app = QApplication.instance() or QApplication([])
+    widget = puyo3.PuyoVsGameWidget()
+    widget.timer.stop()
+    widget.resize(540, 480)
+    for game_logic in (widget.game_logic_p1, widget.game_logic_p2):
+        game_logic.on_chain = lambda chain_count: None  # ボイスは鳴らさない
+        load_fixture(game_logic, rows)
+        game_logic.chain_count = 2
+        game_logic.check_matches()
+    bench_paint_event.app = app  # 計測中にアプリケーションが解放されないよう保持
+    return lambda: widget.grab
+
+
+# (名前, ベンチマーク, 対象のフィクスチャ)
+BENCHMARKS = [
+    ("check_matches", bench_check_matches, tuple(FIXTURES)),
+    ("check_matches_landing", bench_check_matches_landing, tuple(FIXTURES)),
+    ("find_groups", bench_find_groups, tuple(FIXTURES)),
+    ("label_components", bench_label_components, tuple(FIXTURES)),
+    ("fall_puyos", bench_fall_puyos, tuple(FIXTURES)),
+    ("handle_floating_puyos", bench_handle_floating_puyos, tuple(FIXTURES)),
+    ("decide_next_move", bench_decide_next_move, tuple(FIXTURES)),
+    ("decide_next_move_2ply", bench_decide_next_move_2ply, tuple(FIXTURES)),
+    ("update_animations", bench_update_animations, ("chain",)),
+    ("paint_event", bench_paint_event, tuple(FIXTURES)),
+]
+
+
+def measure(setup, repeat):
+    """準備関数から作った処理を repeat 回実行し、1回あたりの時間（マイクロ秒）を返す"""
+    for _ in range(WARMUP):
+        setup()()
+    times = []
+    for _ in range(repeat):
+        func = setup()
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1e6)
+    return times
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmarks(repeat=DEFAULT_REPEAT, only=None):
+    """ベンチマークを実行して結果をまとめる"""
+    results = []
+    for name, bench, fixtures in BENCHMARKS:
+        if only and name not in only:
+            continue
+        for fixture in fixtures:
+            times = measure(bench(FIXTURES[fixture]), repeat)
+            results.append({
+                "name": name,
+                "fixture": fixture,
+                "runs": repeat,
+                "median_us": statistics.median(times),
+                "min_us": min(times),
+                "mean_us": statistics.fmean(times),
+            })
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "numpy": puyo_core.has_numpy,
+        "seed": BENCH_SEED,
+        "results": results,
+    }
+
+
+def print_results(report, baseline=None):
+    # 比較対象があれば中央値の比（基準 / 今回、1より大きければ速くなった）を並べる
+    previous = {}
+    if baseline:
+        previous = {(r["name"], r["fixture"]): r["median_us"] for r in baseline["results"]}
+    print(f"revision {report['revision']}  python {report['python']}  numpy {report['numpy']}")
+    for result in report["results"]:
+        line = f"{result['name']:<24}{result['fixture']:<12}{result['median_us']:>12.1f} us  (min {result['min_us']:.1f})"
+        key = (result["name"], result["fixture"])
+        if key in previous and result["median_us"] > 0:
+            line += f"  x{previous[key] / result['median_us']:.2f}"
+        print(line)
+
+
+# メイン関数
+def main():
+    parser = argparse.ArgumentParser(description="ぷよぷよのエンジンと描画のベンチマーク")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="1つのベンチマークの計測回数")
+    parser.add_argument("--only", nargs="*", help="実行するベンチマーク名")
+    parser.add_argument("--json", metavar="PATH", help="結果をJSONファイルに保存する（-なら標準出力）")
+    parser.add_argument("--compare", metavar="PATH", help="以前に保存したJSONと比較する")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.repeat, args.only)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    if args.json == "-":
+        print(json.dumps(report, indent=2))
+        return
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    print_results(report, baseline)
+
+if __name__ == "__main__":
+    main()
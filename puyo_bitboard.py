@@ -0,0 +1,210 @@
+# ぷよぷよの盤面をビットボードで表現するモジュール
+# 色ごと（お邪魔ぷよを含む）に1つの整数ビットマスクを持ち、
+# 連結判定・落下・衝突判定をビット演算で行う（Qtには依存しない）
+import random
+
+# 盤面サイズ
+GRID_WIDTH = 6
+GRID_HEIGHT = 12
+
+# 色のインデックス（puyo3.py の PUYO_COLORS と同じ並び）
+NUM_COLORS = 4   # 通常ぷよの色数（赤・緑・青・黄）
+OJAMA = 4        # お邪魔ぷよ
+
+# ビット配置: 列ごとに GRID_HEIGHT ビット + 番兵1ビット
+# 各列の最下段がビット0、上に行くほど上位ビットになる
+COLUMN_BITS = GRID_HEIGHT + 1
+COLUMN_MASK = (1 << GRID_HEIGHT) - 1
+COLUMN_MASKS = [COLUMN_MASK << (x * COLUMN_BITS) for x in range(GRID_WIDTH)]
+BOARD_MASK = sum(COLUMN_MASKS)
+BOTTOM_MASK = sum(1 << (x * COLUMN_BITS) for x in range(GRID_WIDTH))
+
+# Zobristハッシュ用の乱数表: ZOBRIST[色][ビット番号]（実行ごとに同じ値になるよう固定シード）
+_zobrist_random = random.Random(0x9E3779B97F4A7C15)
+ZOBRIST = [[_zobrist_random.getrandbits(64) for _ in range(GRID_WIDTH * COLUMN_BITS)]
+           for _ in range(NUM_COLORS + 1)]
+
+
+if hasattr(int, "bit_count"):
+    popcount = int.bit_count  # 立っているビットの数（Python 3.10以降は組み込みを使う）
+else:
+    def popcount(mask):
+        """立っているビットの数（int.bit_countがない古いPython向け）"""
+        return bin(mask).count("1")
+
+
+def cell_bit(x, y):
+    """座標(x, y)に対応するビットを返す（盤外なら0）"""
+    if x < 0 or x >= GRID_WIDTH or y < 0 or y >= GRID_HEIGHT:
+        return 0
+    return 1 << (x * COLUMN_BITS + GRID_HEIGHT - 1 - y)
+
+
+def bit_to_cell(index):
+    """ビット番号を座標(x, y)に変換する"""
+    x, row = divmod(index, COLUMN_BITS)
+    return x, GRID_HEIGHT - 1 - row
+
+
+def iter_cells(mask):
+    """マスク中のセルを列ごとに下から順に返す"""
+    while mask:
+        low = mask & -mask
+        yield bit_to_cell(low.bit_length() - 1)
+        mask ^= low
+
+
+def neighbors(mask):
+    """マスクに上下左右で隣接するセル（自身は含まない）"""
+    return ((mask << 1) | (mask >> 1) | (mask << COLUMN_BITS) | (mask >> COLUMN_BITS)) & BOARD_MASK & ~mask
+
+
+def zobrist_hash(colors):
+    """色ごとのマスクから64ビットのZobristハッシュを計算する"""
+    value = 0
+    for color, mask in enumerate(colors):
+        keys = ZOBRIST[color]
+        while mask:
+            low = mask & -mask
+            value ^= keys[low.bit_length() - 1]
+            mask ^= low
+    return value
+
+
+def supported_mask(occupied):
+    """床から途切れずに積み上がっているセル（落下しないセル）"""
+    # 各列の最下段に1を足すと、下から連続する1の並びだけが繰り上がって0になる
+    # 番兵ビットがあるので満杯の列でも隣の列には桁上がりしない
+    return occupied & ~(occupied + BOTTOM_MASK)
+
+
+class BitBoard:
+    __slots__ = ("colors", "zobrist")
+
+    def __init__(self, colors=None, zobrist=None):
+        # colors[i] は色インデックス i のぷよがあるセルのマスク
+        self.colors = list(colors) if colors is not None else [0] * (NUM_COLORS + 1)
+        # 盤面のZobristハッシュ（配置・消去・落下のたびに差分で更新する）
+        self.zobrist = zobrist if zobrist is not None else zobrist_hash(self.colors)
+
+    @classmethod
+    def from_grid(cls, grid):
+        """Puyoオブジェクトのグリッドからビットボードを作る"""
+        board = cls()
+        for y in range(GRID_HEIGHT):
+            for x in range(GRID_WIDTH):
+                if grid[y][x] is not None:
+                    board.set(x, y, grid[y][x].color)
+        return board
+
+    def copy(self):
+        return BitBoard(self.colors, self.zobrist)
+
+    @property
+    def occupied(self):
+        colors = self.colors
+        return colors[0] | colors[1] | colors[2] | colors[3] | colors[4]
+
+    def get(self, x, y):
+        """セルの色インデックスを返す（空ならNone）"""
+        bit = cell_bit(x, y)
+        for color, mask in enumerate(self.colors):
+            if mask & bit:
+                return color
+        return None
+
+    def set(self, x, y, color):
+        """セルにぷよを置く（別の色のぷよがあれば置き換える。1つのセルに2色が重なることはない）"""
+        bit = cell_bit(x, y)
+        colors = self.colors
+        if not bit or colors[color] & bit:
+            return
+        index = bit.bit_length() - 1
+        for other, mask in enumerate(colors):
+            if mask & bit:
+                colors[other] = mask & ~bit
+                self.zobrist ^= ZOBRIST[other][index]
+                break
+        colors[color] |= bit
+        self.zobrist ^= ZOBRIST[color][index]
+
+    def remove(self, mask):
+        """マスクに含まれるぷよをすべて取り除く"""
+        keep = ~mask
+        self.zobrist ^= zobrist_hash([m & mask for m in self.colors])
+        self.colors = [m & keep for m in self.colors]
+
+    def is_empty(self, x, y):
+        """盤内かつ空いているセルか"""
+        bit = cell_bit(x, y)
+        return bit != 0 and not (self.occupied & bit)
+
+    def find_groups(self, min_size=4, seeds=None):
+        """min_size個以上連結した同色グループを (色, マスク) のリストで返す（seedsを渡せばそのセルを含むグループだけ）"""
+        groups = []
+        for color in range(NUM_COLORS):
+            color_mask = self.colors[color]
+            # 色全体で足りなければ探索しない
+            if popcount(color_mask) < min_size:
+                continue
+            remaining = color_mask if seeds is None else color_mask & seeds
+            while remaining:
+                group = remaining & -remaining
+                # 同色マスク内で膨張させて連結成分を求める
+                while True:
+                    grown = (group | neighbors(group)) & color_mask
+                    if grown == group:
+                        break
+                    group = grown
+                remaining &= ~group
+                if popcount(group) >= min_size:
+                    groups.append((color, group))
+        return groups
+
+    def ojama_adjacent(self, mask):
+        """マスクに隣接するお邪魔ぷよ"""
+        return self.colors[OJAMA] & neighbors(mask)
+
+    def settle(self):
+        """浮いているぷよを各列1回の走査で詰め、落ちたぷよの (x, 元のy, 落下後のy) を返す"""
+        occupied = self.occupied
+        supported = supported_mask(occupied)
+        floating = occupied & ~supported
+        if not floating:
+            return []
+        
+        colors = self.colors
+        new_colors = [m & supported for m in colors]
+        zobrist = self.zobrist
+        drops = []
+        for x in range(GRID_WIDTH):
+            column_floating = floating & COLUMN_MASKS[x]
+            if not column_floating:
+                continue
+            # 支えられているぷよの上から順に詰めていく
+            base = x * COLUMN_BITS
+            land = popcount(supported & COLUMN_MASKS[x])
+            while column_floating:
+                bit = column_floating & -column_floating
+                column_floating ^= bit
+                index = bit.bit_length() - 1
+                for color in range(NUM_COLORS + 1):
+                    if colors[color] & bit:
+                        new_colors[color] |= 1 << (base + land)
+                        zobrist ^= ZOBRIST[color][index] ^ ZOBRIST[color][base + land]
+                        break
+                row = index - base
+                drops.append((x, GRID_HEIGHT - 1 - row, GRID_HEIGHT - 1 - land))
+                land += 1
+        self.colors = new_colors
+        self.zobrist = zobrist
+        return drops
+
+    def column_height(self, x):
+        """列に積まれているぷよの数"""
+        return popcount(self.occupied & COLUMN_MASKS[x])
+
+    def drop_row(self, x):
+        """列xの上から落としたぷよが止まる行（列が埋まっていれば-1）"""
+        column = (self.occupied >> (x * COLUMN_BITS)) & COLUMN_MASK
+        return GRID_HEIGHT - 1 - column.bit_length()
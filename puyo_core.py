@@ -0,0 +1,1352 @@
+# ぷよぷよのゲームルール（Qtに依存しないヘッドレス版）
+# ぷよ・ペア・AI・得点計算・お邪魔ぷよの処理をまとめたモジュール
+# 描画やキー入力は puyo3.py 側でこのクラスを継承して実装する
+import importlib
+import importlib.util
+import math
+import random
+import time
+from collections import OrderedDict
+from puyo_bitboard import (GRID_WIDTH, GRID_HEIGHT, NUM_COLORS, OJAMA,
+                           BitBoard, cell_bit, iter_cells, neighbors, popcount)
+from puyo_profiler import profile_phase
+
+# NumPyがあればAIの配置評価をまとめて行う（読み込みに時間がかかるので最初に使うときに読み込む）
+has_numpy = importlib.util.find_spec("numpy") is not None
+puyo_batch = None
+
+
+def load_batch():
+    """NumPy版の配置評価（puyo_batch）を読み込んで返す（画面側は最初のフレームの後に裏で呼んでおく）"""
+    global puyo_batch
+    if puyo_batch is None:
+        puyo_batch = importlib.import_module("puyo_batch")
+    return puyo_batch
+
+# AIの思考時間（秒）
+AI_THINKING_TIME = 0.5  # AIがぷよを配置するまでの時間
+AI_SEARCH_BUDGET_MS = 8  # NEXTまで読むときに1回の思考で使える時間（ミリ秒）
+TRANSPOSITION_TABLE_SIZE = 1 << 16  # AIと連鎖計算で共有する置換表の最大件数
+ILLEGAL_SCORE = float("-inf")  # 置けない配置の評価値（置ける配置の評価値は負にもなるので、それと区別する）
+
+# ロジックは実時間の経過によらず固定長のティックで進める（画面の速さやヘッドレスでも同じ結果になる）
+LOGIC_STEP_US = 16667  # 1ティックの時間（マイクロ秒、約60Hz。整数で持って誤差をためない）
+LOGIC_DT = LOGIC_STEP_US / 1000000  # 1ティックの時間（秒）
+MAX_TICKS_PER_FRAME = 8  # 処理が追いつかないときに1フレームで進めるティック数の上限
+
+VISUAL_FALL_SPEED = 10  # ぷよが表示上で落ちる速さ（マス/秒）
+STAR_POOL_SIZE = 256  # 1つの盤面で同時に出せる星エフェクトの最大数（超えたら古いものから上書きする）
+
+# ツモ（配られるペアの色の並び）
+TSUMO_LENGTH = 128  # ツモ表の長さ（アーケード版と同じく一周したら先頭に戻る）
+
+# 見た目だけに使う乱数（まばたきなど）。ゲーム進行の乱数とは分けておく
+cosmetic_random = random.Random()
+
+# お邪魔ぷよの攻撃力計算用の定数
+OJAMA_BASE = 10  # 基本攻撃力
+CHAIN_BONUS = [0, 0, 8, 16, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448, 480, 512]  # 連鎖ボーナス
+COLOR_BONUS = [0, 0, 3, 6, 12, 24]  # 色数ボーナス
+GROUP_BONUS = [0, 0, 0, 0, 0, 2, 3, 4, 5, 6, 7, 10]  # 同時消しボーナス
+
+# 操作（キー入力などをこの抽象的な操作に変換して渡す）
+ACTION_LEFT = 0
+ACTION_RIGHT = 1
+ACTION_DOWN = 2
+ACTION_ROTATE_CW = 3   # 時計回り
+ACTION_ROTATE_CCW = 4  # 反時計回り
+ACTION_DROP = 5        # ちぎり（強制落下）
+ACTION_RESTART = 6
+
+ROTATE_ACTIONS = (ACTION_ROTATE_CW, ACTION_ROTATE_CCW)
+
+# 描画側に知らせる見た目が変わった領域（盤面のマス以外）
+REGION_BOARD = "board"  # 盤面全体（リセット・ゲームオーバー）
+REGION_NEXT = "next"    # NEXTのぷよ
+REGION_SCORE = "score"
+REGION_OJAMA = "ojama"  # 待機中のお邪魔ぷよ数
+REGION_CHAIN = "chain"  # 連鎖数の表示
+REGIONS = (REGION_BOARD, REGION_NEXT, REGION_SCORE, REGION_OJAMA, REGION_CHAIN)
+
+# 回転ごとの1つ目から見た2つ目のぷよの位置（0: 上, 1: 右, 2: 下, 3: 左）
+# 0は2つ目が1つ目の下、2は1つ目が2つ目の下になる
+PAIR_OFFSETS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+
+
+# ここが埋まるとゲームオーバー（ペアの出現位置）
+DEATH_MASK = cell_bit(GRID_WIDTH // 2 - 1, 1) | cell_bit(GRID_WIDTH // 2, 1)
+
+
+def pair_cells(x, y, rotation):
+    """ペアの位置 (x, y)（縦置きなら上のマス）から2つのぷよの位置 (x1, y1, x2, y2) を返す"""
+    dx, dy = PAIR_OFFSETS[rotation]
+    y1 = y + 1 if dy < 0 else y
+    return x, y1, x + dx, y1 + dy
+
+
+def pair_mask(x, y, rotation):
+    """ペアが占める2セルのマスク（盤外にはみ出すならNone）"""
+    x1, y1, x2, y2 = pair_cells(x, y, rotation)
+    bit1 = cell_bit(x1, y1)
+    bit2 = cell_bit(x2, y2)
+    if not bit1 or not bit2:
+        return None
+    return bit1 | bit2
+
+
+def chain_bonus(chain_count):
+    """連鎖による攻撃力ボーナス"""
+    return CHAIN_BONUS[min(chain_count, len(CHAIN_BONUS) - 1)]
+
+
+def group_bonus(group_count):
+    """同時消し数による攻撃力ボーナス"""
+    return GROUP_BONUS[min(group_count, len(GROUP_BONUS) - 1)]
+
+
+def color_bonus(color_count):
+    """色数による攻撃力ボーナス"""
+    return COLOR_BONUS[min(color_count, len(COLOR_BONUS) - 1)]
+
+
+def step_score(chain_count, cleared_count, group_count, color_count):
+    """1連鎖分の (得点, お邪魔ぷよ数) を計算"""
+    power = max(1, chain_bonus(chain_count) + group_bonus(group_count) + color_bonus(color_count))
+    return 10 * cleared_count * power, (cleared_count * power) // OJAMA_BASE
+
+
+def place_pair(board, column, rotation, color1, color2, heights=None):
+    """一番上からペアを落とした盤面と位置 (盤面, x1, y1, x2, y2) を返す（置けなければNone）
+    heights（列ごとのぷよの数）を渡せば、落下位置を盤面から求めずにそこから決める"""
+    x1, y1, x2, y2 = pair_cells(column, 0, rotation)
+    if not board.is_empty(x1, y1) or not board.is_empty(x2, y2):
+        return None
+    
+    # 落下位置を計算して配置（下にある方から積む）
+    placed = board.copy()
+    if heights is not None:
+        if x1 == x2:
+            # 縦置きは下になる方が列の一番上に乗り、もう一方がその上に乗る
+            bottom = GRID_HEIGHT - 1 - heights[x1]
+            y1, y2 = (bottom - 1, bottom) if y2 > y1 else (bottom, bottom - 1)
+        else:
+            y1 = GRID_HEIGHT - 1 - heights[x1]
+            y2 = GRID_HEIGHT - 1 - heights[x2]
+        placed.set(x1, y1, color1)
+        placed.set(x2, y2, color2)
+    elif y2 > y1:
+        y2 = placed.drop_row(x2)
+        placed.set(x2, y2, color2)
+        y1 = placed.drop_row(x1)
+        placed.set(x1, y1, color1)
+    else:
+        y1 = placed.drop_row(x1)
+        placed.set(x1, y1, color1)
+        y2 = placed.drop_row(x2)
+        placed.set(x2, y2, color2)
+    return placed, x1, y1, x2, y2
+
+
+# 連鎖1段分の結果
+class ChainStep:
+    __slots__ = ("chain", "groups", "ojama_mask", "score", "ojama")
+
+    def __init__(self, chain, groups, ojama_mask, score, ojama):
+        self.chain = chain            # 何連鎖目か
+        self.groups = groups          # 消えたグループ [(色, マスク), ...]
+        self.ojama_mask = ojama_mask  # 巻き込まれて消えたお邪魔ぷよ
+        self.score = score            # この段の得点
+        self.ojama = ojama            # この段で相手に送るお邪魔ぷよ数
+
+
+# 連鎖全体の結果
+class ChainResult:
+    __slots__ = ("steps", "score", "ojama", "board")
+
+    def __init__(self, steps, score, ojama, board):
+        self.steps = steps  # ChainStep のリスト
+        self.score = score  # 合計得点
+        self.ojama = ojama  # 合計お邪魔ぷよ数
+        self.board = board  # 連鎖が終わった後の盤面
+
+    @property
+    def chain_length(self):
+        return len(self.steps)
+
+
+# 盤面のZobristハッシュをキーにした、件数上限付きのLRU置換表
+class TranspositionTable:
+    def __init__(self, capacity=TRANSPOSITION_TABLE_SIZE):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key):
+        """キーに対応する値を返す（なければNone）"""
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+    
+    def put(self, key, value):
+        entries = self.entries
+        entries[key] = value
+        entries.move_to_end(key)
+        # 一番長く使われていないものから捨てる
+        if len(entries) > self.capacity:
+            entries.popitem(last=False)
+    
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+    
+    def __len__(self):
+        return len(self.entries)
+
+
+def resolve_chain(board, chain_count=0, table=None):
+    """盤面の連鎖をアニメーションなしで最後まで解決する（渡した盤面は変更しない）"""
+    # 置換表があれば同じ盤面の結果を使い回す（結果の盤面は共有されるので変更しないこと）
+    if table is not None:
+        key = ("chain", board.zobrist, chain_count)
+        result = table.get(key)
+        if result is None:
+            result = resolve_chain(board, chain_count)
+            table.put(key, result)
+        return result
+    
+    board = board.copy()
+    board.settle()
+    steps = []
+    total_score = 0
+    total_ojama = 0
+    
+    while True:
+        groups = board.find_groups()
+        if not groups:
+            break
+        chain_count += 1
+        
+        cleared_mask = 0
+        colors = set()
+        for color, mask in groups:
+            cleared_mask |= mask
+            colors.add(color)
+        ojama_mask = board.ojama_adjacent(cleared_mask)
+        board.remove(cleared_mask | ojama_mask)
+        
+        score, ojama = step_score(chain_count, popcount(cleared_mask), len(groups), len(colors))
+        steps.append(ChainStep(chain_count, groups, ojama_mask, score, ojama))
+        total_score += score
+        total_ojama += ojama
+        board.settle()
+    
+    return ChainResult(steps, total_score, total_ojama, board)
+
+
+# 消えていく途中のぷよ1個分の状態（puyo_pop_state にマスの添字をキーにして入れる）
+class PopState:
+    __slots__ = ("x", "y", "color", "time", "scale", "chain", "brightness", "phase")
+
+    def __init__(self, x, y, color, time, chain):
+        self.x = x
+        self.y = y
+        self.color = color
+        self.time = time          # 残り時間（秒）
+        self.scale = 1.0          # 表示の大きさ（倍率）
+        self.chain = chain        # 何連鎖目で消えたか
+        self.brightness = 0.0     # 白く光らせる割合
+        self.phase = 0.0          # 全体の進行度（0.0〜1.0）
+
+
+# 星エフェクトの固定長のリングバッファ（項目ごとのリストで持ち、使い終わった場所を再利用する）
+# 星の寿命はすべて同じなので、消えるのは必ず一番古い星から。追加も削除も先頭と末尾をずらすだけで済む
+class StarPool:
+    def __init__(self, capacity=STAR_POOL_SIZE, duration=1.5):
+        self.capacity = capacity
+        self.duration = duration  # 星の寿命（秒）
+        self.x = [0.0] * capacity
+        self.y = [0.0] * capacity
+        self.color = [0] * capacity
+        self.chain = [0] * capacity
+        self.expires = [0.0] * capacity  # 消える時刻（self.time と同じ時計）
+        self.head = 0    # 一番古い星の位置
+        self.count = 0   # 出ている星の数
+        self.time = 0.0  # エフェクトの時計（秒）
+
+    def add(self, x, y, color, chain):
+        """星を追加する（いっぱいなら一番古い星を上書きし、その位置 (x, y) を返す）"""
+        if self.capacity <= 0:
+            return None  # 容量0なら星は出さない
+        evicted = None
+        if self.count == self.capacity:
+            evicted = (self.x[self.head], self.y[self.head])
+            self.head = (self.head + 1) % self.capacity
+            self.count -= 1
+        i = (self.head + self.count) % self.capacity
+        self.x[i] = x
+        self.y[i] = y
+        self.color[i] = color
+        self.chain[i] = chain
+        self.expires[i] = self.time + self.duration
+        self.count += 1
+        return evicted
+
+    def update(self, dt, mark_dirty):
+        """dt 秒進めて寿命が来た星を消す（出ていた星の位置はすべて mark_dirty(x, y) に渡す）"""
+        self.time = now = self.time + dt
+        for i in self.indices():
+            mark_dirty(self.x[i], self.y[i])
+        while self.count and self.expires[self.head] <= now:
+            self.head = (self.head + 1) % self.capacity
+            self.count -= 1
+
+    def indices(self):
+        capacity = self.capacity
+        return [(self.head + n) % capacity for n in range(self.count)]
+
+    def __iter__(self):
+        """出ている星を古い順に (x, y, 色, 残り時間, 連鎖数) で返す"""
+        for i in self.indices():
+            yield self.x[i], self.y[i], self.color[i], self.expires[i] - self.time, self.chain[i]
+
+    def __len__(self):
+        return self.count
+
+
+# 実時間の経過を固定長のティックに分ける（端数は次のフレームに持ち越す）
+class FixedTimestep:
+    def __init__(self, step_us=LOGIC_STEP_US, max_ticks=MAX_TICKS_PER_FRAME, clock=time.perf_counter):
+        self.step_us = step_us
+        self.max_ticks = max_ticks
+        self.clock = clock  # 実時間の時計（秒）
+        self.last_time = None  # 前のフレームの時刻
+        self.accumulator = 0  # まだティックにしていない時間（マイクロ秒）
+    
+    def frame(self):
+        """前のフレームからの実時間を時計で測り、このフレームで進めるティック数を返す（最初のフレームは1ティック分）"""
+        now = self.clock()
+        if self.last_time is None:
+            dt_us = self.step_us
+        else:
+            # マイクロ秒の整数にしてから積むので、記録したティックの数と描画の速さに関係なく一致する
+            dt_us = max(0, round((now - self.last_time) * 1000000))
+        self.last_time = now
+        return self.advance(dt_us)
+    
+    def advance(self, dt_us):
+        """経過時間（マイクロ秒）を加え、このフレームで進めるティック数を返す"""
+        self.accumulator += dt_us
+        ticks = self.accumulator // self.step_us
+        if ticks > self.max_ticks:
+            # 追いつけない分は捨てる（止まっていた後に一気に進めない）
+            ticks = self.max_ticks
+            self.accumulator = self.step_us * ticks
+        self.accumulator -= self.step_us * ticks
+        return ticks
+    
+    @property
+    def alpha(self):
+        """次のティックまでの進み具合（0.0〜1.0、描画の補間に使う）"""
+        return self.accumulator / self.step_us
+
+
+def new_seed():
+    """ゲーム用のシードを作る"""
+    return random.getrandbits(32)
+
+
+# シードから作るツモ表（同じシードなら対戦相手とも同じ並びになる）
+class TsumoTable:
+    def __init__(self, seed, length=TSUMO_LENGTH, num_colors=NUM_COLORS):
+        self.seed = seed
+        rng = random.Random(seed)
+        self.pairs = [(rng.randrange(num_colors), rng.randrange(num_colors)) for _ in range(length)]
+    
+    @classmethod
+    def from_pairs(cls, seed, pairs):
+        """記録しておいた並びからツモ表を作る（リプレイ用）"""
+        table = cls.__new__(cls)
+        table.seed = seed
+        table.pairs = [tuple(pair) for pair in pairs]
+        return table
+    
+    def __getitem__(self, index):
+        """index番目のペアの色 (軸ぷよ, 子ぷよ)"""
+        return self.pairs[index % len(self.pairs)]
+    
+    def __len__(self):
+        return len(self.pairs)
+
+
+# ぷよぷよのクラス
+class Puyo:
+    def __init__(self, x, y, color):
+        self.x = x
+        self.y = y
+        self.color = color  # 色インデックス（OJAMAならお邪魔ぷよ）
+        self.falling = True
+        self.connected = False
+        self.visual_y = y  # 表示上の位置
+        self.target_y = y  # 目標位置
+        self.eyes_open = True  # 目の開閉状態
+        self.blink_timer = cosmetic_random.uniform(2.0, 5.0)   # まばたきタイマー
+        self.is_ojama = color == OJAMA  # お邪魔ぷよかどうか
+
+    def update(self, dt):
+        # 視覚的な位置を目標位置に近づける
+        if self.visual_y < self.target_y:
+            self.visual_y = min(self.target_y, self.visual_y + dt * VISUAL_FALL_SPEED)
+        
+        # まばたき処理
+        self.blink_timer -= dt
+        if self.blink_timer <= 0:
+            self.eyes_open = not self.eyes_open
+            # 目を開けている時間は長く、閉じている時間は短く
+            if self.eyes_open:
+                self.blink_timer = cosmetic_random.uniform(2.0, 5.0)  # 2〜5秒開ける
+            else:
+                self.blink_timer = cosmetic_random.uniform(0.1, 0.3)  # 0.1〜0.3秒閉じる
+    
+    def interpolated_y(self, alpha):
+        """描画する位置（今のティックから次のティックまでの alpha の割合だけ落下を進めた位置）"""
+        if self.visual_y < self.target_y:
+            return min(self.target_y, self.visual_y + alpha * LOGIC_DT * VISUAL_FALL_SPEED)
+        return self.visual_y
+
+
+def cell_index(x, y):
+    """盤面のマスの添字（上の行から左から順）"""
+    return y * GRID_WIDTH + x
+
+
+# 盤面に置かれたぷよの表示状態（マスごとのオブジェクトではなく、項目ごとに1本のリストで持つ）
+# 添字は cell_index(x, y)。落下とまばたきは盤面ごとに1回のループでまとめて進める
+class PuyoCells:
+    def __init__(self):
+        size = GRID_WIDTH * GRID_HEIGHT
+        self.color = [None] * size     # 色インデックス（空きマスはNone）
+        self.visual_y = [0.0] * size   # 表示上の位置（目標位置はそのマスの行）
+        self.eyes_open = [True] * size
+        self.blink_at = [0.0] * size   # 次に目を開け閉めする時刻（self.time と同じ時計）
+        self.occupied = set()  # ぷよがあるマスの添字
+        self.falling = set()   # 表示上の位置がまだ目標位置より上にあるマスの添字
+        self.time = 0.0        # アニメーションの時計（秒）
+        self.next_blink = math.inf  # 一番早いまばたきの時刻（それまではまばたきのループを回さない）
+
+    def place(self, x, y, color, visual_y=None, eyes_open=True, blink_timer=None):
+        """(x, y) にぷよを置く（操作中のペアのぷよなら見た目の状態を引き継ぐ）"""
+        i = cell_index(x, y)
+        if blink_timer is None:
+            blink_timer = cosmetic_random.uniform(2.0, 5.0)
+        self.color[i] = color
+        self.visual_y[i] = y if visual_y is None else visual_y
+        self.eyes_open[i] = eyes_open
+        self.blink_at[i] = self.time + blink_timer
+        self.next_blink = min(self.next_blink, self.blink_at[i])
+        self.occupied.add(i)
+        if self.visual_y[i] < y:
+            self.falling.add(i)
+
+    def remove(self, x, y):
+        """(x, y) のぷよを取り除き、取り除く前の表示上の位置を返す"""
+        i = cell_index(x, y)
+        self.color[i] = None
+        self.occupied.discard(i)
+        self.falling.discard(i)
+        return self.visual_y[i]
+
+    def move(self, x, from_y, to_y):
+        """ぷよを同じ列の to_y に移す（表示上の位置はそのままにして落下アニメーションさせる）"""
+        src = cell_index(x, from_y)
+        dst = cell_index(x, to_y)
+        for field in (self.color, self.visual_y, self.eyes_open, self.blink_at):
+            field[dst] = field[src]
+        self.color[src] = None
+        self.occupied.discard(src)
+        self.falling.discard(src)
+        self.occupied.add(dst)
+        if self.visual_y[dst] < to_y:
+            self.falling.add(dst)
+
+    def clear(self):
+        for i in self.occupied:
+            self.color[i] = None
+        self.occupied.clear()
+        self.falling.clear()
+
+    def update(self, dt, mark_dirty):
+        """全部のぷよの落下とまばたきを dt 秒進め、見た目が変わった位置を mark_dirty(x, y) に渡す"""
+        self.time = now = self.time + dt
+        visual_y = self.visual_y
+
+        # まばたき（一番早いまばたきの時刻になるまでは何もしない）
+        if now >= self.next_blink:
+            eyes_open = self.eyes_open
+            blink_at = self.blink_at
+            next_blink = math.inf
+            for i in self.occupied:
+                at = blink_at[i]
+                if at <= now:
+                    eyes_open[i] = not eyes_open[i]
+                    # 目を開けている時間は長く、閉じている時間は短く
+                    if eyes_open[i]:
+                        at = blink_at[i] = now + cosmetic_random.uniform(2.0, 5.0)  # 2〜5秒開ける
+                    else:
+                        at = blink_at[i] = now + cosmetic_random.uniform(0.1, 0.3)  # 0.1〜0.3秒閉じる
+                    mark_dirty(i % GRID_WIDTH, visual_y[i])
+                if at < next_blink:
+                    next_blink = at
+            self.next_blink = next_blink
+
+        # 落下（落ちている途中のぷよだけ）
+        if self.falling:
+            step = dt * VISUAL_FALL_SPEED
+            for i in list(self.falling):
+                y, x = divmod(i, GRID_WIDTH)
+                before = visual_y[i]
+                after = visual_y[i] = min(y, before + step)
+                mark_dirty(x, before)
+                mark_dirty(x, after)
+                if after >= y:
+                    self.falling.discard(i)
+
+    def interpolated_y(self, i, alpha):
+        """描画する位置（Puyo.interpolated_y と同じ補間）"""
+        visual_y = self.visual_y[i]
+        if i in self.falling:
+            return min(i // GRID_WIDTH, visual_y + alpha * LOGIC_DT * VISUAL_FALL_SPEED)
+        return visual_y
+
+    def to_grid(self, puyo_class=Puyo):
+        """Puyoオブジェクトの2次元リスト grid[y][x] を作る（変更しても盤面には反映されない）"""
+        grid = [[None] * GRID_WIDTH for _ in range(GRID_HEIGHT)]
+        for i in self.occupied:
+            y, x = divmod(i, GRID_WIDTH)
+            puyo = grid[y][x] = puyo_class(x, y, self.color[i])
+            puyo.visual_y = self.visual_y[i]
+            puyo.eyes_open = self.eyes_open[i]
+            puyo.blink_timer = self.blink_at[i] - self.time
+        return grid
+
+# ぷよぷよのペアクラス
+class PuyoPair:
+    puyo_class = Puyo  # 生成するぷよのクラス（描画側で差し替える）
+    
+    def __init__(self, x, board, available_colors=None, colors=None):
+        self.x = x
+        self.y = 0
+        self.rotation = 0  # 0: 上, 1: 右, 2: 下, 3: 左
+        self.board = board  # 衝突判定に使うビットボード
+        
+        if colors is not None:
+            # ツモ表から配られた色
+            self.colors = list(colors)
+        else:
+            # 使用可能な色が指定されていない場合、デフォルトの色を使用
+            if available_colors is None:
+                # お邪魔ぷよは通常のペアには含めない
+                available_colors = list(range(NUM_COLORS))
+            self.colors = [random.choice(available_colors), random.choice(available_colors)]
+        self.puyo1 = self.puyo_class(x, 0, self.colors[0])
+        self.puyo2 = self.puyo_class(x, 1, self.colors[1])
+        
+        # 初期状態では視覚的な位置を論理位置より上に設定（上から落ちてくる演出）
+        self.puyo1.visual_y = -1
+        self.puyo2.visual_y = 0
+        self.puyo1.target_y = 0
+        self.puyo2.target_y = 1
+    
+    def rotate(self, direction):
+        # 1: 時計回り, -1: 反時計回り
+        old_rotation = self.rotation
+        self.rotation = (self.rotation + direction) % 4
+        
+        # 回転後の位置をチェック
+        if not self.can_rotate():
+            # 回転できなければ元に戻す
+            self.rotation = old_rotation
+            return False
+            
+        self.update_positions()
+        
+        # 回転後に視覚的な位置も即座に更新
+        self.puyo1.visual_y = self.puyo1.y
+        self.puyo2.visual_y = self.puyo2.y
+        
+        return True
+    
+    def can_rotate(self):
+        # 回転先の位置がグリッド内にあり、他のぷよと重ならないか
+        mask = pair_mask(self.x, self.y, self.rotation)
+        return mask is not None and not (self.board.occupied & mask)
+    
+    def update_positions(self):
+        self.puyo1.x, self.puyo1.y, self.puyo2.x, self.puyo2.y = pair_cells(self.x, self.y, self.rotation)
+        
+        # ターゲット位置も更新
+        self.puyo1.target_y = self.puyo1.y
+        self.puyo2.target_y = self.puyo2.y
+    
+    def move(self, dx, dy):
+        new_x = self.x + dx
+        new_y = self.y + dy
+        
+        # 移動先がグリッド内にあるか確認
+        if self.can_move(new_x, new_y):
+            self.x = new_x
+            self.y = new_y
+            
+            # 視覚的な位置も更新
+            if dy > 0:  # 下に移動する場合
+                self.puyo1.target_y = self.puyo1.y
+                self.puyo2.target_y = self.puyo2.y
+            else:  # それ以外の移動の場合は即座に視覚的位置も更新
+                self.puyo1.visual_y = self.puyo1.y
+                self.puyo2.visual_y = self.puyo2.y
+                
+            self.update_positions()
+            return True
+        return False
+        
+    def drop_to_bottom(self):
+        # 一番下まで落とす（ちぎり機能）
+        while self.move(0, 1):
+            pass
+    
+    def can_move(self, new_x, new_y):
+        # 移動先がグリッド内にあり、他のぷよと重ならないか（ビット演算で判定）
+        mask = pair_mask(new_x, new_y, self.rotation)
+        return mask is not None and not (self.board.occupied & mask)
+
+    def update(self, dt):
+        # ぷよの視覚的な位置を更新
+        self.puyo1.update(dt)
+        self.puyo2.update(dt)
+
+# AIプレイヤークラス
+class AIPlayer:
+    def __init__(self, game_logic, search_depth=1, time_budget_ms=AI_SEARCH_BUDGET_MS, table=None, seed=None):
+        self.game_logic = game_logic
+        self.random = random.Random(seed)  # 候補がないときのランダムな動き用
+        self.search_depth = search_depth  # 1: 現在のペアだけ、2: NEXTのペアまで読む
+        self.time_budget_ms = time_budget_ms  # NEXTまで読むときの1回の思考時間の上限（ミリ秒）
+        # 同じ盤面の評価や連鎖計算を使い回す置換表（複数のAIで共有してもよい）
+        self.table = table if table is not None else TranspositionTable()
+        self.thinking_time = 0
+        self.move_delay = 0
+        self.rotation_delay = 0
+        self.decided_moves = []  # AIの次の動きのリスト [(移動方向, 回転方向)]
+        self.current_move_index = 0
+        self.drop_ready = False  # ぷよを落とす準備ができたか
+    
+    def reset(self):
+        self.thinking_time = 0
+        self.decided_moves = []
+        self.current_move_index = 0
+        self.drop_ready = False
+        self.move_delay = 0
+        self.rotation_delay = 0
+    
+    def update(self, dt):
+        if self.game_logic.game_over or self.game_logic.falling_puyos or self.game_logic.waiting_for_pop or self.game_logic.fall_animation_in_progress:
+            return
+        
+        # 思考時間を更新
+        if len(self.decided_moves) == 0:
+            self.thinking_time += dt
+            if self.thinking_time >= AI_THINKING_TIME:
+                self.thinking_time = 0
+                self.decide_next_move()
+        
+        # 移動とローテーションの遅延を処理
+        if self.move_delay > 0:
+            self.move_delay -= dt
+            return
+        
+        if self.rotation_delay > 0:
+            self.rotation_delay -= dt
+            return
+        
+        # 決定した動きを実行
+        if len(self.decided_moves) > 0 and self.current_move_index < len(self.decided_moves):
+            move = self.decided_moves[self.current_move_index]
+            
+            # 操作として反映する（リプレイに記録されるように）
+            if move[0] != 0:  # 横移動
+                self.game_logic.apply_action(ACTION_RIGHT if move[0] > 0 else ACTION_LEFT)
+                self.move_delay = 0.1  # 横移動の遅延
+            elif move[1] != 0:  # 回転
+                self.game_logic.apply_action(ACTION_ROTATE_CW if move[1] > 0 else ACTION_ROTATE_CCW)
+                self.rotation_delay = 0.15  # 回転の遅延
+            
+            self.current_move_index += 1
+        
+        # すべての動きが完了した場合、ぷよを落とす
+        elif len(self.decided_moves) > 0 and self.current_move_index >= len(self.decided_moves) and not self.drop_ready:
+            self.drop_ready = True
+            self.game_logic.apply_action(ACTION_DROP)  # ぷよを落とす
+            self.decided_moves = []  # 動きをリセット
+            self.current_move_index = 0
+            self.drop_ready = False
+    
+    def decide_next_move(self):
+        """次の最適な動きを決定する"""
+        # 現在のぷよペアの色を取得
+        color1 = self.game_logic.current_pair.colors[0]
+        color2 = self.game_logic.current_pair.colors[1]
+        
+        # 各列と回転の組み合わせ（index = 列 * 4 + 回転）をまとめて評価
+        scores = self.evaluate_boards([self.game_logic.board], color1, color2)[0]
+        
+        # スコアの高い順に、実際に到達できる配置を並べる（同点なら先の候補を優先）
+        candidates = []
+        for index in sorted(range(len(scores)), key=lambda i: -scores[i]):
+            if scores[index] == ILLEGAL_SCORE:
+                break
+            moves = self.calculate_moves(*divmod(index, 4))
+            if moves is not None:
+                candidates.append((index, moves))
+        
+        best_moves = []
+        if candidates:
+            best_moves = candidates[0][1]
+            if self.search_depth >= 2 and len(candidates) > 1:
+                best_moves = self.search_next_pair(candidates, scores)
+        
+        # 最適な動きがなかった場合、ランダムな動きを選択
+        if not best_moves:
+            # 左右のランダムな移動
+            rand_column = self.random.randint(0, GRID_WIDTH-1)
+            rand_rotation = self.random.randint(0, 3)
+            best_moves = self.calculate_moves(rand_column, rand_rotation) or []
+        
+        self.decided_moves = best_moves
+    
+    def search_next_pair(self, candidates, scores):
+        """NEXTのペアまで読んで最善の動きを返す（時間切れなら読めた範囲で決める）"""
+        deadline = time.perf_counter() + self.time_budget_ms / 1000
+        board = self.game_logic.board
+        color1, color2 = self.game_logic.current_pair.colors
+        next1, next2 = self.game_logic.next_pair.colors
+        
+        # 1手目を置いて連鎖を解決した盤面を作り、NEXTの配置をまとめて評価
+        # 別の置き方でも同じ盤面になる1手目（同じ色のペアの回転0と2など）は、盤面のハッシュで見分けて1回だけ読む
+        table = self.table
+        expanded = []
+        seen = set()
+        for index, moves in candidates:
+            placed = place_pair(board, *divmod(index, 4), color1, color2)[0]
+            if placed.zobrist in seen:
+                continue
+            seen.add(placed.zobrist)
+            expanded.append((index, moves, resolve_chain(placed, table=table)))
+            # 評価の高い1手目から置いているので、時間切れならそこまでに置いた1手目だけを読む
+            if time.perf_counter() >= deadline:
+                break
+        next_scores = self.evaluate_boards([result.board for _, _, result in expanded], next1, next2)
+        
+        best_moves = candidates[0][1]
+        best_value = None
+        for (index, moves, result), leaf_scores in zip(expanded, next_scores):
+            value = self.next_pair_value(result.board, next1, next2, leaf_scores)
+            value += scores[index] + result.score
+            
+            if best_value is None or value > best_value:
+                best_value = value
+                best_moves = moves
+            # 評価の高い1手目から読んでいるので、時間切れならそこまでの最善を使う
+            if time.perf_counter() >= deadline:
+                break
+        
+        return best_moves
+    
+    def next_pair_value(self, board, next1, next2, leaf_scores):
+        """NEXTのペアを置いたときの最善の評価値（置き方の順番が違っても同じ盤面なら置換表から返す）"""
+        if board.occupied & DEATH_MASK:
+            return float("-inf")
+        key = ("next", board.zobrist, next1, next2)
+        value = self.table.get(key)
+        if value is not None:
+            return value
+        
+        # 2手目の各配置の連鎖を解決して葉を評価
+        value = float("-inf")
+        for next_index, next_score in enumerate(leaf_scores):
+            if next_score == ILLEGAL_SCORE:
+                continue
+            leaf = place_pair(board, *divmod(next_index, 4), next1, next2)[0]
+            leaf_result = resolve_chain(leaf, table=self.table)
+            if leaf_result.board.occupied & DEATH_MASK:
+                continue
+            value = max(value, next_score + leaf_result.score)
+        self.table.put(key, value)
+        return value
+    
+    def evaluate_boards(self, boards, color1, color2):
+        """盤面ごとに全候補（index = 列 * 4 + 回転）の評価値を返す（評価済みの盤面は置換表から返す）"""
+        table = self.table
+        keys = [("scores", board.zobrist, color1, color2) for board in boards]
+        results = [table.get(key) for key in keys]
+        missing = [i for i, scores in enumerate(results) if scores is None]
+        if not missing:
+            return results
+        
+        # まだ評価していない盤面だけをまとめて評価
+        if has_numpy:
+            computed = load_batch().evaluate_boards([boards[i] for i in missing], color1, color2).tolist()
+        else:
+            computed = []
+            for i in missing:
+                # 今の盤面ならゲームロジックが持っている列の高さから落下位置を決める
+                heights = self.game_logic.heights if boards[i] is self.game_logic.board else None
+                computed.append([self.evaluate_placement(column, rotation, color1, color2, boards[i], heights)
+                                 for column in range(GRID_WIDTH) for rotation in range(4)])
+        for i, scores in zip(missing, computed):
+            results[i] = scores
+            table.put(keys[i], scores)
+        return results
+    
+    def calculate_moves(self, target_column, target_rotation):
+        """目標の列と回転に到達するために必要な移動とローテーションを計算"""
+        # 現在の状態を取得
+        current_x = self.game_logic.current_pair.x
+        current_rotation = self.game_logic.current_pair.rotation
+        
+        # 横方向の移動
+        dx = target_column - current_x
+        shifts = [(1 if dx > 0 else -1, 0)] * abs(dx)
+        
+        # 回転方向の移動（時計回りまたは反時計回りのうち近い方を先に試す）
+        rotation_diff = (target_rotation - current_rotation) % 4
+        clockwise = [(0, 1)] * rotation_diff
+        counterclockwise = [(0, -1)] * ((4 - rotation_diff) % 4)
+        turns = (clockwise, counterclockwise) if rotation_diff <= 2 else (counterclockwise, clockwise)
+        
+        # 横に動かしてから回す。壁や積んだぷよで回せなければ逆回りや、回してから動かす順番も試す
+        # （右端で下向きにするときは、時計回りだと途中の右向きが盤外にはみ出す）
+        for rotation_moves in turns:
+            for moves in (shifts + rotation_moves, rotation_moves + shifts):
+                if self.can_follow(moves):
+                    return moves
+        return None
+    
+    def can_follow(self, moves):
+        """今のペアが途中でぶつからずに moves の通りに動けるか（ペアを作らずにマスクだけでたどる）"""
+        occupied = self.game_logic.board.occupied
+        x = self.game_logic.current_pair.x
+        y = self.game_logic.current_pair.y
+        rotation = self.game_logic.current_pair.rotation
+        
+        for move in moves:
+            if move[0] != 0:  # 横移動
+                x += move[0]
+            else:  # 回転
+                rotation = (rotation + move[1]) % 4
+            mask = pair_mask(x, y, rotation)
+            if mask is None or occupied & mask:
+                return False  # 無効な移動・回転
+        return True
+    
+    def evaluate_placement(self, column, rotation, color1, color2, board=None, heights=None):
+        """配置の評価関数"""
+        # 仮想盤面にぷよを配置（ビットボードなのでコピーは色数分の整数だけ）
+        if board is None:
+            board = self.game_logic.board
+            heights = self.game_logic.heights
+        placed = place_pair(board, column, rotation, color1, color2, heights)
+        if placed is None:
+            return ILLEGAL_SCORE
+        virtual_board, x1, y1, x2, y2 = placed
+        
+        # 評価スコア
+        score = 0
+        
+        # 周囲の同色ぷよの数をカウント
+        score += self.count_same_color_neighbors(x1, y1, color1, virtual_board) * 10
+        score += self.count_same_color_neighbors(x2, y2, color2, virtual_board) * 10
+        
+        # 高さに対するペナルティ（低いほど良い）
+        height_penalty = (GRID_HEIGHT - y1) + (GRID_HEIGHT - y2)
+        score -= height_penalty * 2
+        
+        # 中央配置のボーナス
+        center_bonus = GRID_WIDTH / 2
+        score += (center_bonus - abs(x1 - center_bonus)) + (center_bonus - abs(x2 - center_bonus))
+        
+        return score
+    
+    def count_same_color_neighbors(self, x, y, color, board):
+        """同じ色の隣接ぷよをカウント"""
+        return popcount(neighbors(cell_bit(x, y)) & board.colors[color])
+
+# ゲームロジッククラス
+class PuyoGameLogic:
+    puyo_class = Puyo  # grid を組み立てるときのクラス
+    pair_class = PuyoPair  # ぷよペアのクラス
+    star_pool_size = STAR_POOL_SIZE  # 同時に出せる星エフェクトの最大数
+    verify_matches = False  # デバッグ用: 変化したマスからの探索結果を盤面全体の探索と照合する
+    
+    def __init__(self, is_player2=False, opponent=None, clock=None, seed=None):
+        self.is_player2 = is_player2  # プレイヤー2（AI）かどうか
+        self.opponent = opponent  # 対戦相手のゲームロジック
+        self.clock = clock or time.monotonic  # 入力間隔の判定に使う時計（秒を返す関数）
+        self.pending_ojama = 0  # 待機中のお邪魔ぷよ数
+        self.ojama_drop_timer = 0  # お邪魔ぷよを落とすまでのタイマー
+        self.recorder = None  # リプレイの記録先（puyo_replay.ReplayRecorder）
+        self.reset(seed)
+    
+    @property
+    def player_index(self):
+        return 1 if self.is_player2 else 0
+    
+    def reset(self, seed=None, tsumo=None):
+        # シードを指定しなければ新しい並びで始める（同じシードなら同じツモ・お邪魔の降り方になる）
+        self.seed = seed if seed is not None else new_seed()
+        self.tsumo = tsumo if tsumo is not None else TsumoTable(self.seed)
+        self.tsumo_index = 0  # 次に配るツモの位置
+        self.random = random.Random(f"ojama-{self.seed}")  # お邪魔ぷよの落下位置用の乱数
+        # 盤面の本体はビットボードで持ち、cellsは描画用の表示状態を保持する
+        self.board = BitBoard()
+        self.cells = PuyoCells()
+        self.heights = [0] * GRID_WIDTH  # 列ごとに積まれているぷよの数（置く・消すたびに更新する）
+        # 前回の check_matches() から置いたり落ちたりしたマス（新しいグループは必ずここを含む）
+        self.touched = 0
+        self.current_pair = self.create_new_pair()
+        self.next_pair = self.create_new_pair()
+        self.fall_time = 0
+        self.fall_speed = 0.5  # ぷよが1マス落ちる時間（秒）
+        self.game_over = False
+        self.score = 0
+        self.chain_count = 0
+        self.falling_puyos = False
+        self.last_key_time = 0
+        self.key_delay = 0.15  # キー入力の遅延（秒）
+        self.last_rotation_time = 0
+        self.rotation_delay = 0.25  # 回転の遅延（秒）
+        self.effect_duration = 1.5  # エフェクトの持続時間を1.5秒に延長
+        self.pop_effects = StarPool(self.star_pool_size, self.effect_duration)  # 消去エフェクト（星）
+        self.puyo_pop_state = {}  # ぷよの消去状態を管理（cell_index(x, y) → PopState）
+        self.flash_frequency = 8  # 点滅の頻度（1秒あたりの回数）
+        self.waiting_for_pop = False  # 消去アニメーション待機中
+        self.pop_wait_time = 0.0  # 待機時間
+        self.pop_wait_duration = 1.0  # 消去後の待機時間（秒）
+        self.fall_animation_in_progress = False  # 落下アニメーション中
+        self.pending_ojama = 0  # 待機中のお邪魔ぷよ数をリセット
+        self.ojama_drop_timer = 0  # お邪魔ぷよを落とすまでのタイマーをリセット
+        # 前回 take_dirty() してから見た目が変わったマスと領域（リセット直後は全体を描き直す）
+        self.dirty_cells = set()
+        self.dirty_regions = set(REGIONS)
+        self.drawn_state = None  # 前回 take_dirty() したときの操作中ペアと表示する値
+        if self.recorder is not None:
+            self.recorder.reset(self.player_index, self.seed, self.tsumo)
+    
+    def create_new_pair(self):
+        # ツモ表から順に配る（お邪魔ぷよは通常ぷよペアとして生成されない）
+        colors = self.tsumo[self.tsumo_index]
+        self.tsumo_index += 1
+        return self.pair_class(GRID_WIDTH // 2 - 1, self.board, colors=colors)
+    
+    @property
+    def grid(self):
+        """盤面のぷよをPuyoオブジェクトの2次元リスト grid[y][x] にして返す（呼ぶたびに作る。変更しても盤面には反映されない）"""
+        return self.cells.to_grid(self.puyo_class)
+    
+    def add_puyos_to_grid(self, puyo1, puyo2):
+        # ペアのぷよの見た目の状態（途中の位置・目の状態）を盤面の表示状態に引き継ぐ
+        for puyo in (puyo1, puyo2):
+            if 0 <= puyo.y < GRID_HEIGHT and 0 <= puyo.x < GRID_WIDTH:
+                self.board.set(puyo.x, puyo.y, puyo.color)
+                self.heights[puyo.x] += 1
+                self.touched |= cell_bit(puyo.x, puyo.y)
+                self.cells.place(puyo.x, puyo.y, puyo.color, puyo.visual_y, puyo.eyes_open, puyo.blink_timer)
+                puyo.target_y = puyo.y
+                self.mark_dirty(puyo.x, puyo.visual_y)
+                
+        # 横に置いた場合、下が空いていれば落とす処理
+        self.handle_floating_puyos()
+    
+    def recount_heights(self):
+        """列の高さを盤面から数え直す（盤面を直接書き換えたときに呼ぶ）"""
+        self.heights = [self.board.column_height(x) for x in range(GRID_WIDTH)]
+    
+    def drop_row(self, x):
+        """列xの上から落としたぷよが止まる行（列が埋まっていれば-1。ぷよが落ち切っているときだけ正しい）"""
+        return GRID_HEIGHT - 1 - self.heights[x]
+    
+    def handle_floating_puyos(self):
+        # 横に置いて空中に浮いている状態のぷよを落とす
+        self.fall_puyos()
+    
+    def check_game_over(self):
+        # ペアの出現位置（DEATH_MASK の2列の上から2段目）まで積み上がったかチェック
+        if max(self.heights[GRID_WIDTH // 2 - 1], self.heights[GRID_WIDTH // 2]) >= GRID_HEIGHT - 1:
+            self.game_over = True
+            
+    def quick_drop(self):
+        # ちぎり機能（一番下まで落とす）
+        if not self.falling_puyos and not self.game_over and not self.fall_animation_in_progress:
+            self.current_pair.drop_to_bottom()
+                
+            # 落下アニメーションのための視覚的位置の更新
+            self.current_pair.puyo1.target_y = self.current_pair.puyo1.y
+            self.current_pair.puyo2.target_y = self.current_pair.puyo2.y
+            self.fall_animation_in_progress = True
+                
+            # 固定する
+            self.add_puyos_to_grid(self.current_pair.puyo1, self.current_pair.puyo2)
+            # 連鎖チェック
+            if not self.check_matches():
+                self.current_pair = self.next_pair
+                self.next_pair = self.create_new_pair()
+                self.check_game_over()
+    
+    def drop_ojama_puyos(self):
+        """お邪魔ぷよを落とす処理"""
+        if self.pending_ojama <= 0:
+            return
+        
+        # 落とす数（最大で一度に30個まで）
+        drop_count = min(self.pending_ojama, 30)
+        self.pending_ojama -= drop_count
+        
+        # 各列にランダムに配置
+        columns = list(range(GRID_WIDTH))
+        self.random.shuffle(columns)
+        
+        # 操作中のペアがいるマスには落とさない（その列の分は次に落とすときまで待たせる）
+        pair = self.current_pair
+        pair_bits = pair_mask(pair.x, pair.y, pair.rotation) or 0
+        
+        for i in range(drop_count):
+            col = columns[i % GRID_WIDTH]
+            
+            # 落下位置を計算（列の一番上まで埋まっていれば置けない）
+            row = self.drop_row(col)
+            if row < 0:
+                continue
+            if cell_bit(col, row) & pair_bits:
+                self.pending_ojama += 1
+                continue
+            
+            # お邪魔ぷよを配置（表示上は上から落ちてくる。お邪魔ぷよ同士はつながらないので touched には入れない）
+            self.board.set(col, row, OJAMA)
+            self.heights[col] += 1
+            self.cells.place(col, row, OJAMA, visual_y=-1)
+            self.mark_dirty(col, -1)
+            
+            self.fall_animation_in_progress = True
+    
+    def check_matches(self):
+        # 4つ以上連結したぷよをビットボード上で探す（お邪魔ぷよは通常の連鎖に含めない）
+        # 前回見つけたグループは消してあるので、探すのは前回から置いたり落ちたりしたマスを含むグループだけでよい
+        color_groups = self.board.find_groups(seeds=self.touched)
+        if self.verify_matches:
+            full_groups = self.board.find_groups()
+            if sorted(color_groups) != sorted(full_groups):
+                raise RuntimeError(f"incremental match check found {color_groups}, full scan found {full_groups}")
+        self.touched = 0
+        
+        groups = []
+        cleared_mask = 0
+        for color_index, mask in color_groups:
+            groups.append((color_index, list(iter_cells(mask))))
+            cleared_mask |= mask
+        
+        # 連鎖があればぷよを消して得点計算
+        if groups:
+            self.chain_count += 1
+            total_cleared = 0
+            
+            # 連鎖の通知（ボイス再生などは描画側で実装する）
+            self.on_chain(self.chain_count)
+            
+            # ぷよを消す&エフェクトを追加
+            for color, group in groups:
+                total_cleared += len(group)
+                for x, y in group:
+                    # ぷよの消去状態を作成
+                    self.puyo_pop_state[cell_index(x, y)] = PopState(x, y, color, self.effect_duration, self.chain_count)
+                    
+                    # 連鎖数に応じた星エフェクト
+                    if self.chain_count > 1:
+                        star_count = min(1 + (self.chain_count - 1) // 2, 5)
+                        
+                        for i in range(star_count):
+                            angle = (i * 360 / star_count) * 3.14159 / 180
+                            offset_x = math.cos(angle) * 0.5
+                            offset_y = math.sin(angle) * 0.5
+                            
+                            # いっぱいで古い星を上書きしたら、その星を消すために描き直す
+                            evicted = self.pop_effects.add(x + offset_x, y + offset_y, color, self.chain_count)
+                            if evicted is not None:
+                                self.mark_dirty(*evicted)
+                    
+                    # 盤面の表示状態から削除
+                    # 落下の途中で消えることもあるので、見た目の位置と消去エフェクトの位置の両方
+                    self.heights[x] -= 1
+                    self.mark_dirty(x, self.cells.remove(x, y))
+                    self.mark_dirty(x, y)
+            self.board.remove(cleared_mask)
+            
+            # 隣接するお邪魔ぷよも消す
+            self.clear_adjacent_ojama_puyos(cleared_mask)
+            
+            # 得点とお邪魔ぷよの攻撃力を計算
+            color_count = len({color_index for color_index, _ in color_groups})
+            score, ojama_count = step_score(self.chain_count, total_cleared, len(groups), color_count)
+            self.score += score
+            
+            # 対戦相手にお邪魔ぷよを送る
+            if self.opponent is not None:
+                self.opponent.pending_ojama += ojama_count
+            
+            # 消去アニメーション待機状態に移行
+            self.waiting_for_pop = True
+            self.pop_wait_time = 0.0
+            
+            return True
+        else:
+            self.chain_count = 0
+            return False
+    
+    def clear_adjacent_ojama_puyos(self, cleared_mask):
+        """消去されたぷよに隣接するお邪魔ぷよを消去"""
+        ojama_mask = self.board.ojama_adjacent(cleared_mask)
+        
+        # お邪魔ぷよを消去
+        for x, y in iter_cells(ojama_mask):
+            self.puyo_pop_state[cell_index(x, y)] = PopState(x, y, OJAMA, self.effect_duration, self.chain_count)
+            self.heights[x] -= 1
+            self.mark_dirty(x, self.cells.remove(x, y))
+            self.mark_dirty(x, y)
+        self.board.remove(ojama_mask)
+    
+    def fall_puyos(self):
+        """浮いているぷよを各列1回で落とし、(x, 落下後のy, 落下距離) のリストを返す"""
+        drops = []
+        for x, from_y, to_y in self.board.settle():
+            # 表示状態はマスだけ移し、今の表示上の位置から落下アニメーションさせる
+            self.cells.move(x, from_y, to_y)
+            self.touched |= cell_bit(x, to_y)
+            drops.append((x, to_y, to_y - from_y))
+        
+        if drops:
+            self.fall_animation_in_progress = True  # アニメーション中フラグをセット
+        return drops
+    
+    def on_chain(self, chain_count):
+        """連鎖が発生したときに呼ばれる（ヘッドレスでは何もしない）"""
+        pass
+    
+    def mark_dirty(self, x, y):
+        """(x, y) に描いたものを再描画の対象にする（座標が小数なら重なるマスすべて）"""
+        left = math.floor(x)
+        top = math.floor(y)
+        for cell_x in (left, left + 1) if x != left else (left,):
+            self.dirty_cells.add((cell_x, top))
+            if y != top:
+                self.dirty_cells.add((cell_x, top + 1))
+    
+    def take_dirty(self):
+        """前回から見た目が変わったマスと領域を (マスの集合, 領域の集合) で返す（描画側が毎フレーム呼ぶ）"""
+        # 操作中のペアと表示する値は前回との比較で調べる（キー入力・落下・アニメーションのどこで変わってもよい）
+        pair_state = ()
+        pair_puyos = ()
+        if not self.falling_puyos and not self.game_over and not self.waiting_for_pop:
+            pair_puyos = (self.current_pair.puyo1, self.current_pair.puyo2)
+            pair_state = tuple((puyo.x, puyo.visual_y, puyo.color, puyo.eyes_open) for puyo in pair_puyos)
+        state = (pair_state, tuple(self.next_pair.colors), self.score, self.pending_ojama,
+                 self.chain_count, self.game_over)
+        drawn = self.drawn_state
+        if drawn is None:
+            self.dirty_regions.update(REGIONS)
+        elif drawn != state:
+            if drawn[0] != state[0]:
+                # ペアが動いたら前の位置と今の位置を描き直す
+                for x, visual_y, _, _ in drawn[0] + state[0]:
+                    self.mark_dirty(x, visual_y)
+            # NEXT・スコア・お邪魔ぷよ数・連鎖数・ゲームオーバーは値が変わった領域だけ
+            regions = (REGION_NEXT, REGION_SCORE, REGION_OJAMA, REGION_CHAIN, REGION_BOARD)
+            for region, before, after in zip(regions, drawn[1:], state[1:]):
+                if before != after:
+                    self.dirty_regions.add(region)
+        self.drawn_state = state
+        
+        # 落下中のぷよは描画側がティックの間の位置を補間するので、ティックがなかったフレームでも描き直す
+        # （補間で進むのは1ティック分 = 1/6マスまでなので、描画側の余白に収まる）
+        for i in self.cells.falling:
+            self.mark_dirty(i % GRID_WIDTH, self.cells.visual_y[i])
+        for puyo in pair_puyos:
+            if puyo.visual_y < puyo.target_y:
+                self.mark_dirty(puyo.x, puyo.visual_y)
+        
+        dirty = (self.dirty_cells, self.dirty_regions)
+        self.dirty_cells = set()
+        self.dirty_regions = set()
+        return dirty
+    
+    def handle_action(self, action):
+        """抽象的な操作を受け付ける。操作が反映されたらTrue"""
+        if self.falling_puyos or self.game_over or self.waiting_for_pop or self.fall_animation_in_progress:
+            return False
+        
+        # 入力の制限時間を設ける
+        current_time = self.clock()
+        if current_time - self.last_key_time < self.key_delay:
+            return False
+        
+        # 回転に時間がかかるようにする
+        if current_time - self.last_rotation_time < self.rotation_delay and action in ROTATE_ACTIONS:
+            return False
+                
+        moved = self.apply_action(action)
+        if moved:
+            if action in ROTATE_ACTIONS:
+                self.last_rotation_time = current_time
+            self.last_key_time = current_time
+        return moved
+    
+    def apply_action(self, action):
+        """操作を入力間隔の制限なしで反映する（AIやリプレイの再生もここを通す）"""
+        moved = False
+        if action == ACTION_LEFT:
+            moved = self.current_pair.move(-1, 0)
+        elif action == ACTION_RIGHT:
+            moved = self.current_pair.move(1, 0)
+        elif action == ACTION_DOWN:
+            moved = self.current_pair.move(0, 1)
+        elif action == ACTION_ROTATE_CW:
+            moved = self.current_pair.rotate(1)   # 時計回り
+        elif action == ACTION_ROTATE_CCW:
+            moved = self.current_pair.rotate(-1)  # 反時計回り
+        elif action == ACTION_DROP:
+            self.quick_drop()
+            moved = True
+        elif action == ACTION_RESTART and self.game_over:  # ゲームオーバー時のリスタート
+            self.reset()  # リセットは reset() 側で記録する
+            return True
+        
+        if moved and self.recorder is not None:
+            self.recorder.action(self.player_index, action)
+        return moved
+    
+    def update_animations(self, dt):
+        # ぷよの消去アニメーション更新
+        for key, pop_state in list(self.puyo_pop_state.items()):
+            pop_state.time -= dt
+            
+            # 全体の進行度（0.0〜1.0）
+            progress = 1.0 - (pop_state.time / self.effect_duration)
+            pop_state.phase = progress
+            
+            # 点滅のためのフラッシュ状態計算（sin波を使用）
+            flash_state = math.sin(progress * self.flash_frequency * math.pi * 2) * 0.5 + 0.5
+            
+            # 消去アニメーションのフェーズで挙動変更 - 連鎖数に関わらず同じ演出
+            if progress < 0.2:  # 最初の20%で膨らむ
+                pop_state.scale = 1.0 + (progress / 0.2) * 0.3  # 最大1.3倍まで膨らむ
+                # 点滅しながら明るくなる
+                pop_state.brightness = progress / 0.2 * 0.4 * (0.5 + flash_state * 0.5)
+            elif progress < 0.6:  # 20%〜60%は点滅しながら維持
+                pop_state.scale = 1.3 - ((progress - 0.2) / 0.4) * 0.1  # わずかに縮む
+                # 点滅する明るさ（0.4〜0.7）
+                pop_state.brightness = 0.4 + flash_state * 0.3
+            elif progress < 0.8:  # 60%〜80%は輝きながらゆっくり縮む
+                pop_state.scale = 1.2 - ((progress - 0.6) / 0.2) * 0.4  # 1.2倍から0.8倍に
+                # 完全に明るく（0.7〜1.0）
+                pop_state.brightness = 0.7 + (progress - 0.6) / 0.2 * 0.3
+            else:  # 残り20%で一気に縮んでいく
+                pop_state.scale = 0.8 - ((progress - 0.8) / 0.2) * 0.8  # 0.8倍から0倍に縮む
+                # 最大明るさで消えていく
+                pop_state.brightness = 1.0
+            
+            self.mark_dirty(pop_state.x, pop_state.y)
+            if pop_state.time <= 0:
+                del self.puyo_pop_state[key]
+        
+        # エフェクトの更新
+        self.pop_effects.update(dt, self.mark_dirty)
+        
+        # 盤面のぷよの落下とまばたきをまとめて更新（動いたりまばたきしたぷよは前後の位置を再描画する）
+        self.cells.update(dt, self.mark_dirty)
+        
+        # 落下アニメーションの終了判定
+        if self.fall_animation_in_progress and not self.cells.falling:
+            self.fall_animation_in_progress = False
+    
+    def step(self, dt, profiler=None):
+        """1フレーム分進める（ゲーム状態と操作中のペアのアニメーション、profilerがあれば時間を測る）"""
+        if not self.game_over:
+            with profile_phase(profiler, "animation"):
+                self.update_animations(dt)
+            with profile_phase(profiler, "logic"):
+                self.update_rules(dt)
+        with profile_phase(profiler, "animation"):
+            self.update_pair_animation(dt)
+    
+    def update_pair_animation(self, dt):
+        # 操作中のペアのアニメーション更新
+        if not self.falling_puyos and not self.game_over and not self.waiting_for_pop:
+            self.current_pair.update(dt)
+    
+    def update_rules(self, dt):
+        """アニメーション以外のゲーム進行（お邪魔ぷよ・連鎖待ち・落下・固定）"""
+        # お邪魔ぷよの処理
+        if self.pending_ojama > 0 and not self.falling_puyos and not self.waiting_for_pop and not self.fall_animation_in_progress:
+            self.ojama_drop_timer += dt
+            if self.ojama_drop_timer >= 0.5:  # 0.5秒ごとにお邪魔ぷよを落とす
+                self.ojama_drop_timer = 0
+                self.drop_ojama_puyos()
+        
+        # 消去アニメーション待機処理
+        if self.waiting_for_pop:
+            self.pop_wait_time += dt
+            if self.pop_wait_time >= self.pop_wait_duration:
+                self.waiting_for_pop = False
+                self.pop_wait_time = 0
+                self.falling_puyos = True
+            return
+        
+        # 落下アニメーション中は他の操作を止める
+        if self.fall_animation_in_progress:
+            return
+        
+        # 通常の落下処理
+        if self.falling_puyos:
+            if not self.fall_puyos():
+                self.falling_puyos = False
+                # 落下が終わったら再度連鎖をチェック
+                if not self.check_matches():
+                    # 連鎖がなければ新しいぷよペアを生成
+                    self.current_pair = self.next_pair
+                    self.next_pair = self.create_new_pair()
+                    self.check_game_over()
+            return
+        
+        self.fall_time += dt
+        if self.fall_time >= self.fall_speed:
+            self.fall_time = 0
+            if not self.current_pair.move(0, 1):
+                # 移動できなければ固定する
+                self.add_puyos_to_grid(self.current_pair.puyo1, self.current_pair.puyo2)
+                # 連鎖チェック
+                if not self.check_matches():
+                    self.current_pair = self.next_pair
+                    self.next_pair = self.create_new_pair()
+                    self.check_game_over()
+
+
+def step_match(logics, ai_players=(), dt=LOGIC_DT, profiler=None):
+    """全員を1ティック進める（全プレイヤーのロジック → AI の順。画面・セルフプレイ・リプレイで同じ順番にする）"""
+    for game_logic in logics:
+        game_logic.step(dt, profiler)
+    if ai_players:
+        with profile_phase(profiler, "ai"):
+            for ai_player in ai_players:
+                ai_player.update(dt)
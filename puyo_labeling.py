@@ -0,0 +1,86 @@
+# 同色の連結成分をまとめてラベル付けするモジュール（Qtには依存しない）
+# 再帰を使わず、隣接セル番号の事前計算と使い回しのバッファだけで探索する
+from puyo_bitboard import GRID_WIDTH, GRID_HEIGHT
+
+
+class ConnectedComponents:
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT):
+        self.width = width
+        self.size = width * height
+        # セル番号 i = y * width + x に対応する座標と、上下左右の隣接セル番号
+        self.coords = tuple(divmod(i, width) for i in range(self.size))
+        self.neighbors = tuple(
+            tuple(ny * width + nx
+                  for nx, ny in ((x, y - 1), (x + 1, y), (x, y + 1), (x - 1, y))
+                  if 0 <= nx < width and 0 <= ny < height)
+            for y, x in self.coords
+        )
+        # 使い回すバッファ（探索のたびに確保しない）
+        self.visited = [0] * self.size      # 訪問済みの世代番号
+        self.stack = [0] * self.size        # 探索用の明示的なスタック
+        self.order = [0] * self.size        # グループごとに並べたセル番号
+        self.group_start = [0] * self.size  # グループの order 上の開始位置
+        self.group_size = [0] * self.size   # グループのぷよ数
+        self.group_count = 0
+        # 世代番号を進めることで訪問フラグのリセットを省く
+        self.generation = 0
+
+    def label(self, grid, min_size=4, ignore_color=None):
+        """gridを1回走査して同色の連結成分を求め、min_size個以上のグループ数を返す"""
+        self.generation += 1
+        generation = self.generation
+        coords = self.coords
+        neighbors = self.neighbors
+        visited = self.visited
+        stack = self.stack
+        order = self.order
+        count = 0
+        write = 0
+
+        for i in range(self.size):
+            if visited[i] == generation:
+                continue
+            visited[i] = generation
+            y, x = coords[i]
+            puyo = grid[y][x]
+            if puyo is None:
+                continue
+            color = puyo.color
+            if ignore_color is not None and color == ignore_color:
+                continue
+
+            # 明示的なスタックで同色のセルをたどる
+            start = write
+            stack[0] = i
+            top = 1
+            while top:
+                top -= 1
+                cell = stack[top]
+                order[write] = cell
+                write += 1
+                for n in neighbors[cell]:
+                    if visited[n] != generation:
+                        ny, nx = coords[n]
+                        other = grid[ny][nx]
+                        if other is not None and other.color == color:
+                            visited[n] = generation
+                            stack[top] = n
+                            top += 1
+
+            if write - start >= min_size:
+                self.group_start[count] = start
+                self.group_size[count] = write - start
+                count += 1
+            else:
+                # 小さいグループは記録せず領域を再利用する
+                write = start
+
+        self.group_count = count
+        return count
+
+    def iter_group(self, index):
+        """index番目のグループのセル座標(x, y)を返す"""
+        start = self.group_start[index]
+        for k in range(start, start + self.group_size[index]):
+            y, x = self.coords[self.order[k]]
+            yield x, y
@@ -0,0 +1,108 @@
+# ゲームループの処理時間をフレームごとに計測するモジュール（Qtには依存しない）
+# ロジック・AI・アニメーション・描画の時間を記録し、パーセンタイルと落ちたフレーム数を出す
+# JSON Linesで1フレーム1行のログも書き出せる
+import json
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+FRAME_BUDGET = 0.016  # 1フレームの目標時間（秒、QTimerの16ms）
+PROFILE_WINDOW = 600  # パーセンタイルを計算する直近のフレーム数（約10秒）
+PHASES = ("logic", "ai", "animation", "paint")
+
+
+def profile_phase(profiler, name):
+    """profilerがあればその処理の時間を測る（なければ何もしない）"""
+    return profiler.phase(name) if profiler is not None else nullcontext()
+
+
+def percentile(values, q):
+    """ソート済みのリストのqパーセンタイル（最近傍法）"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))
+    return values[index]
+
+
+class FrameProfiler:
+    def __init__(self, budget=FRAME_BUDGET, window=PROFILE_WINDOW, log_path=None):
+        self.budget = budget
+        self.history = {name: deque(maxlen=window) for name in PHASES + ("interval",)}
+        self.frame = 0  # 記録したフレーム数
+        self.dropped = 0  # 間に合わなかったフレームの合計
+        self.current = None  # 計測中のフレームの処理時間
+        self.frame_start = None
+        self.log = open(log_path, "w") if log_path else None
+        self.first_frame_ms = None  # 起動から最初のフレームまでの時間（画面側が記録する）
+
+    def begin_frame(self):
+        """フレームの開始（前のフレームはここで締める。描画は次のフレームの開始までに終わる）"""
+        now = time.perf_counter()
+        if self.current is not None:
+            self.finish_frame(now)
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.frame_start = now
+
+    def add(self, name, seconds):
+        if self.current is not None:
+            self.current[name] += seconds
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def finish_frame(self, now):
+        interval = now - self.frame_start
+        # 前のフレームから目標時間の1.5倍以上空いたら、その間に描けなかったフレームを数える
+        dropped = max(0, round(interval / self.budget) - 1) if interval >= self.budget * 1.5 else 0
+        self.dropped += dropped
+        self.frame += 1
+        for name, seconds in self.current.items():
+            self.history[name].append(seconds)
+        self.history["interval"].append(interval)
+        if self.log is not None:
+            record = {"frame": self.frame, "time": self.frame_start, "interval_ms": interval * 1000}
+            record.update((f"{name}_ms", seconds * 1000) for name, seconds in self.current.items())
+            record["dropped"] = dropped
+            self.log.write(json.dumps(record) + "\n")
+
+    def percentiles(self, name):
+        """直近のフレームの p50/p95/p99/最大（ミリ秒）"""
+        values = sorted(self.history[name])
+        return {
+            "p50": percentile(values, 50) * 1000,
+            "p95": percentile(values, 95) * 1000,
+            "p99": percentile(values, 99) * 1000,
+            "max": (values[-1] if values else 0.0) * 1000,
+        }
+
+    def summary(self):
+        return {
+            "frames": self.frame,
+            "dropped": self.dropped,
+            "first_frame_ms": self.first_frame_ms,
+            "phases": {name: self.percentiles(name) for name in PHASES + ("interval",)},
+        }
+
+    def overlay_lines(self):
+        """画面に重ねて表示する文字列"""
+        lines = [f"frames {self.frame}  dropped {self.dropped}"]
+        if self.first_frame_ms is not None:
+            lines[0] += f"  first frame {self.first_frame_ms:.0f} ms"
+        for name in PHASES + ("interval",):
+            stats = self.percentiles(name)
+            lines.append(f"{name:<9} p50 {stats['p50']:5.2f}  p95 {stats['p95']:5.2f}  p99 {stats['p99']:5.2f} ms")
+        return lines
+
+    def close(self):
+        """計測を終える（計測中のフレームを締めてログを閉じる）"""
+        if self.current is not None:
+            self.finish_frame(time.perf_counter())
+            self.current = None
+        if self.log is not None:
+            self.log.close()
+            self.log = None
@@ -0,0 +1,188 @@
+# 対戦のリプレイをコンパクトなバイナリで記録・再生するモジュール（Qtには依存しない）
+# 記録するのはシード・ツモ表・フレームごとの経過時間・各プレイヤーの操作だけで、
+# 再生はヘッドレスのゲームロジックに同じ順番で流し込む（画面の速度に縛られない）
+# 例: python puyo3.py --record match.puyorep  →  python puyo_replay.py match.puyorep
+import argparse
+import struct
+import sys
+import time
+
+import puyo_core
+
+# ファイル形式
+# ヘッダ: マジック(4) バージョン(1) プレイヤー数(1)
+# イベント: 先頭1バイトの上位4ビットが種類
+#   0x0_: フレーム   続けて経過時間（マイクロ秒）の可変長整数
+#   0x1_: 操作       下位4ビット = プレイヤー(1ビット) << 3 | 操作(3ビット)
+#   0x2_: リセット   下位4ビット = プレイヤー、続けてシード(u32) ツモ数(u8) ツモ（1ペア1バイト）
+REPLAY_MAGIC = b"PUYR"
+REPLAY_VERSION = 1
+HEADER = struct.Struct("<4sBB")
+RESET = struct.Struct("<IB")
+
+EVENT_TICK = 0
+EVENT_ACTION = 1
+EVENT_RESET = 2
+
+
+def quantize_dt(dt):
+    """経過時間をマイクロ秒の整数にする（記録時も再生時もこの値から dt を作るので結果が一致する）"""
+    return max(0, round(dt * 1000000))
+
+
+def _write_varint(data, value):
+    while value >= 0x80:
+        data.append((value & 0x7F) | 0x80)
+        value >>= 7
+    data.append(value)
+
+
+def _read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+# リプレイの記録
+class ReplayRecorder:
+    def __init__(self, players=1):
+        self.players = players
+        self.data = bytearray(HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, players))
+
+    def attach(self, game_logic):
+        """ゲームロジックの操作とリセットを記録する（ゲーム開始直後に呼ぶ）"""
+        game_logic.recorder = self
+        self.reset(game_logic.player_index, game_logic.seed, game_logic.tsumo)
+
+    def tick(self, dt_us):
+        """1フレーム分の経過時間（quantize_dt の値）を記録する"""
+        self.data.append(EVENT_TICK << 4)
+        _write_varint(self.data, dt_us)
+
+    def action(self, player, action):
+        self.data.append(EVENT_ACTION << 4 | player << 3 | action)
+
+    def reset(self, player, seed, tsumo):
+        self.data.append(EVENT_RESET << 4 | player)
+        self.data += RESET.pack(seed, len(tsumo))
+        self.data += bytes(color1 << 4 | color2 for color1, color2 in tsumo.pairs)
+
+    def to_bytes(self):
+        return bytes(self.data)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.data)
+
+
+def read_replay(data):
+    """リプレイを読み込み、(プレイヤー数, [(種類, プレイヤー, 値), ...]) を返す"""
+    magic, version, players = HEADER.unpack_from(data)
+    if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+        raise ValueError("not a puyo replay (or unsupported version)")
+
+    events = []
+    pos = HEADER.size
+    while pos < len(data):
+        head = data[pos]
+        pos += 1
+        kind = head >> 4
+        if kind == EVENT_TICK:
+            dt_us, pos = _read_varint(data, pos)
+            events.append((EVENT_TICK, None, dt_us))
+        elif kind == EVENT_ACTION:
+            events.append((EVENT_ACTION, (head >> 3) & 1, head & 7))
+        elif kind == EVENT_RESET:
+            seed, count = RESET.unpack_from(data, pos)
+            pos += RESET.size
+            pairs = [(byte >> 4, byte & 0x0F) for byte in data[pos:pos + count]]
+            pos += count
+            events.append((EVENT_RESET, head & 0x0F, (seed, pairs)))
+        else:
+            raise ValueError(f"unknown replay event {head:#04x} at {pos - 1}")
+    return players, events
+
+
+def load_replay(path):
+    with open(path, "rb") as f:
+        return read_replay(f.read())
+
+
+def create_logics(players, logic_class=puyo_core.PuyoGameLogic):
+    """リプレイ用のゲームロジックを作る（2人なら対戦相手としてつなぐ）"""
+    logics = [logic_class(is_player2=player == 1) for player in range(players)]
+    if players == 2:
+        logics[0].opponent = logics[1]
+        logics[1].opponent = logics[0]
+    return logics
+
+
+def play_replay(replay, logics=None, on_frame=None):
+    """リプレイを最高速度で再生し、(ゲームロジックのリスト, フレーム数) を返す"""
+    players, events = replay
+    if logics is None:
+        logics = create_logics(players)
+
+    frames = 0
+    for kind, player, value in events:
+        if kind == EVENT_TICK:
+            # 記録時と同じ順番で全員を1フレーム進める
+            puyo_core.step_match(logics, (), value / 1000000)
+            frames += 1
+            if on_frame is not None:
+                on_frame(logics)
+        elif kind == EVENT_ACTION:
+            logics[player].apply_action(value)
+        else:
+            seed, pairs = value
+            logics[player].reset(seed, puyo_core.TsumoTable.from_pairs(seed, pairs))
+    return logics, frames
+
+
+def render_replay(replay):
+    """puyo3.py の画面に描画しながら再生する（描画以外は待たない）"""
+    from PyQt5.QtWidgets import QApplication
+    import puyo3
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    players = replay[0]
+    widget = puyo3.PuyoVsGameWidget() if players == 2 else puyo3.PuyoGameWidget()
+    widget.timer.stop()  # 画面側のゲーム進行とAIは止める
+    widget.show()
+    if players == 2:
+        logics = [widget.game_logic_p1, widget.game_logic_p2]
+    else:
+        logics = [widget.game_logic]
+
+    def on_frame(_):
+        widget.repaint()
+        app.processEvents()
+
+    return play_replay(replay, logics, on_frame)
+
+
+# メイン関数
+def main():
+    parser = argparse.ArgumentParser(description="リプレイを最高速度で再生する")
+    parser.add_argument("path", help="リプレイファイル")
+    parser.add_argument("--render", action="store_true", help="画面に描画しながら再生する")
+    args = parser.parse_args()
+
+    replay = load_replay(args.path)
+    start = time.perf_counter()
+    logics, frames = render_replay(replay) if args.render else play_replay(replay)
+    elapsed = time.perf_counter() - start
+
+    print(f"frames: {frames} in {elapsed:.3f}s ({frames / elapsed if elapsed > 0 else 0:.0f} frames/sec)")
+    for game_logic in logics:
+        state = "game over" if game_logic.game_over else "playing"
+        print(f"P{game_logic.player_index + 1}: score {game_logic.score}  {state}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# CPU同士の対戦を画面なしでまとめて回すスクリプト
+# 2つの PuyoGameLogic を対戦相手としてつなぎ、それぞれ AIPlayer で動かす
+# 例: python puyo_selfplay.py --matches 10000 --workers 8 --depth2 2
+import argparse
+import json
+import multiprocessing
+import time
+from collections import Counter
+from functools import partial
+
+import puyo_core
+
+# 1フレームで進める時間（秒）。画面と同じティックなので、画面で同じ操作をしたときと同じ結果になる
+# （--dt 0.1 のように粗くすると速く回せるが、落下や連鎖待ちのタイミングが画面とは変わる）
+SELFPLAY_DT = puyo_core.LOGIC_DT
+# NEXTまで読むときの思考時間の上限（ミリ秒）。時間で打ち切ると結果がマシンの速さや負荷で変わるので、既定では打ち切らない
+SELFPLAY_BUDGET_MS = float("inf")
+# これ以上続いた試合は引き分けにする（画面と同じティックでゲーム内の時間で約1時間）
+MAX_FRAMES = 200000
+
+
+# 連鎖の長さを記録するゲームロジック
+class RecordingGameLogic(puyo_core.PuyoGameLogic):
+    def reset(self, seed=None, tsumo=None):
+        super().reset(seed, tsumo)
+        self.chains = []  # 発生した連鎖の長さ
+
+    def on_chain(self, chain_count):
+        # 1連鎖目で新しい連鎖を記録し、続く段で長さを更新する
+        if chain_count == 1:
+            self.chains.append(1)
+        else:
+            self.chains[-1] = chain_count
+
+
+def play_match(seed, depth1=1, depth2=1, time_budget_ms=SELFPLAY_BUDGET_MS, dt=SELFPLAY_DT):
+    """1試合を最後まで進めて結果を返す（time_budget_ms が無限大なら、同じ引数で同じ結果になる）"""
+    p1 = RecordingGameLogic(seed=seed)
+    p2 = RecordingGameLogic(is_player2=True, opponent=p1, seed=seed)
+    p1.opponent = p2
+    ai_players = (
+        puyo_core.AIPlayer(p1, search_depth=depth1, time_budget_ms=time_budget_ms, seed=seed),
+        puyo_core.AIPlayer(p2, search_depth=depth2, time_budget_ms=time_budget_ms, seed=seed + 1),
+    )
+
+    # 画面と同じく、両プレイヤーを1ティック進めてからAIを動かす
+    frames = 0
+    while frames < MAX_FRAMES and not (p1.game_over or p2.game_over):
+        puyo_core.step_match((p1, p2), ai_players, dt)
+        frames += 1
+
+    # 先にゲームオーバーになった方の負け（同時・時間切れは引き分け）
+    if p1.game_over == p2.game_over:
+        winner = 0
+    else:
+        winner = 2 if p1.game_over else 1
+    return {
+        "seed": seed,
+        "winner": winner,
+        "frames": frames,
+        # 最初に配られる2つ（現在とNEXT）を除いた数が実際に置いた数
+        "moves": [max(0, p.tsumo_index - 2) for p in (p1, p2)],
+        "scores": [p1.score, p2.score],
+        "chains": [p1.chains, p2.chains],
+    }
+
+
+def summarize(results, elapsed):
+    """試合結果を集計する"""
+    matches = len(results)
+    moves = sum(sum(result["moves"]) for result in results)
+    winners = Counter(result["winner"] for result in results)
+    chains = [Counter(), Counter()]
+    for result in results:
+        for player, lengths in enumerate(result["chains"]):
+            chains[player].update(lengths)
+    return {
+        "matches": matches,
+        "seconds": elapsed,
+        "matches_per_sec": matches / elapsed if elapsed > 0 else 0.0,
+        "moves_per_sec": moves / elapsed if elapsed > 0 else 0.0,
+        "win_rate": {
+            "p1": winners[1] / matches if matches else 0.0,
+            "p2": winners[2] / matches if matches else 0.0,
+            "draw": winners[0] / matches if matches else 0.0,
+        },
+        "chain_distribution": [{str(length): count for length, count in sorted(counter.items())}
+                               for counter in chains],
+        "max_chain": [max(counter, default=0) for counter in chains],
+    }
+
+
+def run_matches(matches, workers=None, seed=0, **options):
+    """matches試合をプロセスプールで並列に回し、集計結果を返す"""
+    seeds = range(seed, seed + matches)
+    play = partial(play_match, **options)
+    start = time.perf_counter()
+    if workers == 1:
+        results = list(map(play, seeds))
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            chunksize = max(1, matches // ((workers or multiprocessing.cpu_count()) * 8))
+            results = list(pool.imap_unordered(play, seeds, chunksize))
+    return summarize(results, time.perf_counter() - start)
+
+
+def print_summary(summary):
+    print(f"matches: {summary['matches']} in {summary['seconds']:.2f}s")
+    print(f"matches/sec: {summary['matches_per_sec']:.2f}  moves/sec: {summary['moves_per_sec']:.1f}")
+    win_rate = summary["win_rate"]
+    print(f"win rate: P1 {win_rate['p1']:.1%}  P2 {win_rate['p2']:.1%}  draw {win_rate['draw']:.1%}")
+    for player, distribution in enumerate(summary["chain_distribution"]):
+        counts = " ".join(f"{length}:{count}" for length, count in distribution.items())
+        print(f"P{player + 1} chains (max {summary['max_chain'][player]}): {counts}")
+
+
+# メイン関数
+def main():
+    parser = argparse.ArgumentParser(description="CPU同士の対戦を画面なしで並列に回す")
+    parser.add_argument("--matches", type=int, default=100, help="試合数")
+    parser.add_argument("--workers", type=int, default=None, help="プロセス数（省略時はCPU数、1なら並列化しない）")
+    parser.add_argument("--seed", type=int, default=0, help="最初の試合のシード（試合ごとに1ずつ増やす）")
+    parser.add_argument("--depth1", type=int, default=1, help="P1のAIの読みの深さ（1 or 2）")
+    parser.add_argument("--depth2", type=int, default=1, help="P2のAIの読みの深さ（1 or 2）")
+    parser.add_argument("--budget-ms", type=float, default=SELFPLAY_BUDGET_MS,
+                        help="読みの時間の上限（ミリ秒、省略時は上限なし。指定すると結果が実行時間に左右される）")
+    parser.add_argument("--dt", type=float, default=SELFPLAY_DT, help="1ティックで進める時間（秒、省略時は画面と同じ）")
+    parser.add_argument("--json", action="store_true", help="結果をJSONで出力する")
+    args = parser.parse_args()
+
+    summary = run_matches(args.matches, workers=args.workers, seed=args.seed,
+                          depth1=args.depth1, depth2=args.depth2,
+                          time_budget_ms=args.budget_ms, dt=args.dt)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+
+if __name__ == "__main__":
+    main()
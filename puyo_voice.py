@@ -0,0 +1,208 @@
+# 連鎖ボイスを専用のスレッドで再生するモジュール（Qtには依存しない）
+# ゲームループは読み上げる文をキューに積むだけで待たない
+# キューがいっぱいなら一番古い文を捨て、積んでから時間が経ちすぎた文も読まずに捨てる
+# simpleaudio があれば一度読み上げた文を音声ファイルに保存し、次からはそれを鳴らす
+# 例: python puyo_voice.py  （全部の連鎖ボイスを先に音声ファイルにしておく）
+import argparse
+import hashlib
+import importlib.util
+import os
+import queue
+import threading
+import time
+
+# TTS機能と保存した音声ファイルの再生（起動を速くするため、使うときに読み込む）
+has_tts = importlib.util.find_spec("pyttsx3") is not None
+has_audio = importlib.util.find_spec("simpleaudio") is not None
+
+# 連鎖ボイス
+CHAIN_VOICES = {
+    2: "ファイヤー",
+    3: "アイスストーム",
+    4: "ダイアキュート",
+    5: "ばよえーん",
+    6: "イレブンチェーン",
+    7: "マジカルフィーバー",
+    8: "ブレインダンプ",
+    9: "ジュゲム",
+    10: "バイオレットハイ",
+    11: "ミラクルボンバー",
+    12: "ファンタスティック"
+}
+
+VOICE_RATE = 150  # 読み上げの速さ
+VOICE_QUEUE_SIZE = 2  # 再生待ちにしておく文の最大数
+VOICE_MAX_AGE = 1.0  # 積んでからこれ以上経った文は読まない（秒）
+VOICE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "puyo", "voices")  # 音声ファイルの保存先
+
+
+def create_tts_engine():
+    import pyttsx3
+    engine = pyttsx3.init()
+    engine.setProperty('rate', VOICE_RATE)
+    return engine
+
+
+# 読み上げた文の音声ファイル（文と読み上げの設定ごとに1ファイル）
+class VoiceCache:
+    def __init__(self, directory=VOICE_CACHE_DIR):
+        self.directory = directory
+        self.clips = {}  # 読み込んだ音声（ファイルパス → simpleaudio.WaveObject）
+
+    def path(self, engine, text):
+        # 声・速さ・音量が変われば別のファイルにする
+        settings = (engine.getProperty('voice'), engine.getProperty('rate'), engine.getProperty('volume'), text)
+        name = hashlib.sha1(repr(settings).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.directory, name + ".wav")
+
+    def render(self, engine, text):
+        """文を音声ファイルにする（すでにあれば何もしない）。作れなければNone"""
+        path = self.path(engine, text)
+        if os.path.exists(path):
+            return path
+        os.makedirs(self.directory, exist_ok=True)
+        # 書きかけのファイルを再生しないよう、別名で書いてから置き換える
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            engine.save_to_file(text, temp_path)
+            engine.runAndWait()
+            # 読み上げエンジンによってはファイルを書かずに終わることがある
+            if not os.path.exists(temp_path):
+                return None
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return path
+
+    def play(self, engine, text):
+        """保存した音声があれば鳴らして終わるまで待つ。なければFalse"""
+        path = self.path(engine, text)
+        clip = self.clips.get(path)
+        if clip is None:
+            if not os.path.exists(path):
+                return False
+            import simpleaudio
+            try:
+                clip = simpleaudio.WaveObject.from_wave_file(path)
+            except Exception:
+                # WAVでないファイル（macOSの読み上げはAIFFで書く）などは読めないので、作り直さずに毎回読み上げる
+                self.clips[path] = False
+                return False
+            self.clips[path] = clip
+        elif clip is False:
+            return False
+        clip.play().wait_done()
+        return True
+
+
+def warm_up(texts=tuple(CHAIN_VOICES.values()), cache=None, engine=None):
+    """まだ音声ファイルがない文をまとめて音声ファイルにする（対戦前に呼んでおく）"""
+    cache = cache or VoiceCache()
+    engine = engine or create_tts_engine()
+    return [cache.render(engine, text) for text in texts]
+
+
+class VoiceWorker:
+    def __init__(self, engine_factory=create_tts_engine, cache=None, maxsize=VOICE_QUEUE_SIZE, max_age=VOICE_MAX_AGE):
+        self.engine_factory = engine_factory  # 読み上げエンジンを作る関数（再生するスレッドの中で呼ぶ）
+        self.cache = cache  # 音声ファイル（VoiceCache、なければ毎回読み上げる）
+        self.queue = queue.Queue(maxsize)
+        self.max_age = max_age
+        self.dropped = 0  # 読まずに捨てた文の数（ゲーム側と再生スレッドの両方で数えるので drop() を通す）
+        self.thread = None
+        self.lock = threading.Lock()
+        self.failed = False  # 読み上げエンジンを作れなかった（もう積まない）
+
+    def say(self, text):
+        """文を再生待ちに積む（すぐに戻る。いっぱいなら一番古い文と入れ替える）"""
+        if self.failed:
+            return
+        self.start()
+        item = (time.monotonic(), text)
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.drop()
+                except queue.Empty:
+                    pass
+
+    def drop(self):
+        with self.lock:
+            self.dropped += 1
+
+    def start(self):
+        # 最初に読み上げるときにスレッドを起動する（終了時に待たないようデーモンにする）
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="voice", daemon=True)
+                self.thread.start()
+
+    def run(self):
+        try:
+            engine = self.engine_factory()
+        except Exception:
+            # 読み上げられないので、誰も読まないキューに積み続けないようにする
+            self.failed = True
+            return
+        while True:
+            queued_at, text = self.queue.get()
+            if time.monotonic() - queued_at > self.max_age:
+                self.drop()
+                continue
+            try:
+                self.speak(engine, text)
+            except Exception:
+                # 1つの文で失敗してもスレッドは止めない（音声ファイルを使わずに読み上げてみる）
+                try:
+                    engine.say(text)
+                    engine.runAndWait()
+                except Exception:
+                    self.drop()
+
+    def speak(self, engine, text):
+        # 音声ファイルを使うときは、先に音声ファイルにしてから鳴らす
+        # （読み上げてから保存すると、その間に待っている次の文が古くなって捨てられる）
+        if self.cache is not None:
+            if self.cache.play(engine, text):
+                return
+            if self.cache.render(engine, text) is not None and self.cache.play(engine, text):
+                return
+        engine.say(text)
+        engine.runAndWait()
+
+
+# 全プレイヤーで1つの再生スレッドを共有する
+_voice_worker = None
+
+
+def voice_worker():
+    global _voice_worker
+    if _voice_worker is None:
+        _voice_worker = VoiceWorker(cache=VoiceCache() if has_audio else None)
+    return _voice_worker
+
+
+def play_chain_voice(chain_count):
+    """連鎖数に応じたボイスを再生待ちに積む（TTSがなければ何もしない）"""
+    if chain_count in CHAIN_VOICES and has_tts:
+        voice_worker().say(CHAIN_VOICES[chain_count])
+
+
+# メイン関数
+def main():
+    parser = argparse.ArgumentParser(description="連鎖ボイスを先に音声ファイルにしておく")
+    parser.add_argument("--dir", default=VOICE_CACHE_DIR, help="音声ファイルの保存先")
+    args = parser.parse_args()
+
+    if not has_tts:
+        parser.exit(1, "pyttsx3 is not installed\n")
+    for text, path in zip(CHAIN_VOICES.values(), warm_up(cache=VoiceCache(args.dir))):
+        print(f"{path or '(not saved)'}  {text}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# テストで共有する盤面の作り方
+import random
+
+import pytest
+
+from puyo_bitboard import GRID_WIDTH, GRID_HEIGHT, NUM_COLORS, OJAMA, BitBoard
+
+ROW_COLORS = "RGBYO"  # 盤面を文字列で書くときの色（O = お邪魔ぷよ、. = 空き）
+
+
+def build_random_board(seed, ojama=0.0, holes=0.0, max_height=GRID_HEIGHT, board=None):
+    """列ごとにランダムな高さまで積んだ盤面（同じシードなら同じ盤面）
+    ojama: お邪魔ぷよにする割合、holes: 空けておく割合（上のぷよが浮く）"""
+    rng = random.Random(seed)
+    board = board if board is not None else BitBoard()
+    for x in range(GRID_WIDTH):
+        for y in range(GRID_HEIGHT - rng.randint(0, max_height), GRID_HEIGHT):
+            if rng.random() < holes:
+                continue
+            board.set(x, y, OJAMA if rng.random() < ojama else rng.randrange(NUM_COLORS))
+    return board
+
+
+def build_board(rows):
+    """上から1行ずつの文字列から盤面を作る（足りない行は上を空ける）"""
+    board = BitBoard()
+    top = GRID_HEIGHT - len(rows)
+    for row, line in enumerate(rows):
+        for x, char in enumerate(line):
+            if char != ".":
+                board.set(x, top + row, ROW_COLORS.index(char))
+    return board
+
+
+def load_board(game_logic, board):
+    """ゲームロジックの盤面と表示状態を board と同じにする（全部のマスを次の check_matches() で調べる）"""
+    game_logic.board.remove(game_logic.board.occupied)
+    game_logic.cells.clear()
+    for x in range(GRID_WIDTH):
+        for y in range(GRID_HEIGHT):
+            color = board.get(x, y)
+            if color is not None:
+                game_logic.board.set(x, y, color)
+                game_logic.cells.place(x, y, color)
+    game_logic.touched = game_logic.board.occupied
+    game_logic.recount_heights()
+    return game_logic
+
+
+@pytest.fixture
+def random_board():
+    return build_random_board
+
+
+@pytest.fixture
+def board_from_rows():
+    return build_board
+
+
+@pytest.fixture
+def logic_with_board():
+    return load_board
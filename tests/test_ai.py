@@ -0,0 +1,74 @@
+# AIPlayer の手の選び方
+import pytest
+
+import puyo_bench
+import puyo_core
+from puyo_bitboard import GRID_WIDTH
+
+
+def chain_fixture(seed):
+    return puyo_bench.load_fixture(puyo_core.PuyoGameLogic(seed=seed), puyo_bench.CHAIN_ROWS)
+
+
+def legal_placements(ai_player):
+    """今のペアを実際に置ける (列, 回転) と、置いた後の連鎖の結果"""
+    game_logic = ai_player.game_logic
+    color1, color2 = game_logic.current_pair.colors
+    placements = {}
+    for column in range(GRID_WIDTH):
+        for rotation in range(4):
+            placed = puyo_core.place_pair(game_logic.board, column, rotation, color1, color2)
+            if placed is not None and ai_player.calculate_moves(column, rotation) is not None:
+                placements[column, rotation] = puyo_core.resolve_chain(placed[0])
+    return placements
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_two_ply_plays_chain_trigger_on_tall_board(seed):
+    # 置ける配置の評価値がすべて負の盤面でも、候補から外さずに連鎖が一番長くなる手を選ぶ
+    ai_player = puyo_core.AIPlayer(chain_fixture(seed), search_depth=2, time_budget_ms=float("inf"))
+    placements = legal_placements(ai_player)
+    ai_player.decide_next_move()
+    chosen = [result for (column, rotation), result in placements.items()
+              if ai_player.calculate_moves(column, rotation) == ai_player.decided_moves]
+    assert len(chosen) == 1
+    assert chosen[0].chain_length == max(result.chain_length for result in placements.values())
+
+
+def test_every_placement_is_reachable_on_empty_board():
+    # 右端の下向きのように、横に動かしてから回すと壁にぶつかる配置にも回してから動かして届く
+    ai_player = puyo_core.AIPlayer(puyo_core.PuyoGameLogic(seed=0))
+    for column in range(GRID_WIDTH):
+        for rotation in range(4):
+            if puyo_core.pair_mask(column, 0, rotation) is not None:
+                assert ai_player.calculate_moves(column, rotation) is not None, (column, rotation)
+
+
+@pytest.mark.parametrize("colors, expanded", [((0, 1), 22), ((2, 2), 11)])
+def test_two_ply_expands_each_first_board_once(colors, expanded):
+    # 回転0と2が同じ盤面になるのは同じ色のペアだけ（横置きも左右が同じ色なら1つ隣の逆向きと同じ盤面になる）
+    game_logic = puyo_core.PuyoGameLogic(seed=0)
+    pair = game_logic.current_pair
+    pair.colors = list(colors)
+    pair.puyo1.color, pair.puyo2.color = colors
+    assert (puyo_core.place_pair(game_logic.board, 2, 0, *colors)[0].colors ==
+            puyo_core.place_pair(game_logic.board, 2, 2, *colors)[0].colors) == (colors[0] == colors[1])
+
+    ai_player = puyo_core.AIPlayer(game_logic, search_depth=2, time_budget_ms=float("inf"))
+    evaluated = []
+    evaluate_boards = ai_player.evaluate_boards
+    ai_player.evaluate_boards = lambda boards, *args: evaluated.append(len(boards)) or evaluate_boards(boards, *args)
+    ai_player.decide_next_move()
+    assert evaluated == [1, expanded]  # 今の盤面、1手目を置いた盤面
+
+
+def test_two_ply_stops_expanding_when_out_of_time():
+    # 時間切れなら、連鎖の計算とNEXTの評価を残りの1手目に対して行わずに、読めた範囲の最善手を返す
+    game_logic = chain_fixture(0)
+    ai_player = puyo_core.AIPlayer(game_logic, search_depth=2, time_budget_ms=0)
+    evaluated = []
+    evaluate_boards = ai_player.evaluate_boards
+    ai_player.evaluate_boards = lambda boards, *args: evaluated.append(len(boards)) or evaluate_boards(boards, *args)
+    ai_player.decide_next_move()
+    assert evaluated == [1, 1]
+    assert ai_player.decided_moves
@@ -0,0 +1,51 @@
+# NumPy版の配置評価（puyo_batch）が AIPlayer.evaluate_placement と同じ値を返すか
+import pytest
+
+import puyo_bench
+import puyo_core
+from puyo_bitboard import GRID_WIDTH, NUM_COLORS
+
+puyo_batch = pytest.importorskip("puyo_batch")  # numpy がなければ飛ばす
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_evaluate_boards_matches_evaluate_placement(random_board, seed):
+    # 満杯の列やお邪魔ぷよも混ぜた盤面を、同じ色と別の色のペアの両方で評価する
+    ai_player = puyo_core.AIPlayer(puyo_core.PuyoGameLogic(seed=seed))
+    boards = [random_board(seed * 5 + i, ojama=0.1) for i in range(5)]
+    color1, color2 = seed % NUM_COLORS, (seed // 2) % NUM_COLORS
+
+    batch = puyo_batch.evaluate_boards(boards, color1, color2).tolist()
+    for board, scores in zip(boards, batch):
+        expected = [ai_player.evaluate_placement(column, rotation, color1, color2, board)
+                    for column in range(GRID_WIDTH) for rotation in range(4)]
+        assert scores == expected
+
+
+def test_evaluate_boards_with_game_logic_heights(random_board):
+    # 今の盤面はゲームロジックの列の高さを使う経路でも同じ値になる
+    game_logic = puyo_core.PuyoGameLogic(seed=1)
+    random_board(1, ojama=0.1, board=game_logic.board)
+    game_logic.recount_heights()
+    ai_player = puyo_core.AIPlayer(game_logic)
+    for color1 in range(NUM_COLORS):
+        for color2 in range(NUM_COLORS):
+            expected = [ai_player.evaluate_placement(column, rotation, color1, color2)
+                        for column in range(GRID_WIDTH) for rotation in range(4)]
+            assert puyo_batch.evaluate_boards([game_logic.board], color1, color2)[0].tolist() == expected
+
+
+@pytest.mark.parametrize("fixture", ["near_full", "chain"])
+def test_evaluate_boards_keeps_negative_legal_scores(fixture):
+    # 積み上がった盤面では置ける配置の評価値も-1以下になるので、置けない配置（-inf）と区別できること
+    game_logic = puyo_bench.make_logic(puyo_bench.FIXTURES[fixture])
+    board = game_logic.board
+    scores = puyo_batch.evaluate_boards([board], 0, 1)[0].tolist()
+    legal = [puyo_core.place_pair(board, column, rotation, 0, 1) is not None
+             for column in range(GRID_WIDTH) for rotation in range(4)]
+    assert any(legal)
+    assert [score != puyo_core.ILLEGAL_SCORE for score in scores] == legal
+    assert min(score for score, ok in zip(scores, legal) if ok) <= -1
+    ai_player = puyo_core.AIPlayer(game_logic)
+    assert scores == [ai_player.evaluate_placement(column, rotation, 0, 1)
+                      for column in range(GRID_WIDTH) for rotation in range(4)]
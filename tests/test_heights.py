@@ -0,0 +1,55 @@
+# PuyoGameLogic.heights（列ごとのぷよの数）が、着地・落下・消去・お邪魔ぷよのあとも盤面と一致し続けるか
+import pytest
+
+import puyo_core
+from puyo_bitboard import GRID_WIDTH, OJAMA
+
+
+def board_heights(game_logic):
+    return [game_logic.board.column_height(x) for x in range(GRID_WIDTH)]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_heights_follow_board_every_tick(seed):
+    p1 = puyo_core.PuyoGameLogic(seed=seed)
+    p2 = puyo_core.PuyoGameLogic(is_player2=True, opponent=p1, seed=seed)
+    p1.opponent = p2
+    # 2手読みのAIのほうが連鎖を組むので、相手にお邪魔ぷよが降る
+    ai_players = (puyo_core.AIPlayer(p1, seed=seed), puyo_core.AIPlayer(p2, search_depth=2, time_budget_ms=float("inf"), seed=seed))
+    saw_ojama = False
+    for _ in range(20000):
+        puyo_core.step_match((p1, p2), ai_players)
+        for game_logic in (p1, p2):
+            assert game_logic.heights == board_heights(game_logic)
+            saw_ojama = saw_ojama or bool(game_logic.board.colors[OJAMA])
+        if p1.game_over or p2.game_over:
+            break
+    assert saw_ojama
+    # ゲームオーバーは出現位置の列の高さで決まる
+    loser = p1 if p1.game_over else p2
+    assert loser.game_over
+    assert loser.board.occupied & puyo_core.DEATH_MASK
+
+
+def test_heights_after_ojama_deferred_by_active_pair(board_from_rows, logic_with_board):
+    # 操作中のペアのすぐ下まで積んだ列には、その列の分のお邪魔ぷよを落とさずに待たせる
+    column = puyo_core.PuyoGameLogic(seed=0).current_pair.x
+    rows = tuple("." * column + "RG"[row % 2] + "." * (GRID_WIDTH - column - 1) for row in range(10))
+    game_logic = logic_with_board(puyo_core.PuyoGameLogic(seed=0), board_from_rows(rows))
+    pair_bits = puyo_core.pair_mask(game_logic.current_pair.x, game_logic.current_pair.y, game_logic.current_pair.rotation)
+    game_logic.pending_ojama = GRID_WIDTH
+    game_logic.drop_ojama_puyos()
+    assert game_logic.pending_ojama == 1
+    assert not game_logic.board.occupied & pair_bits
+    assert game_logic.heights == board_heights(game_logic)
+    assert game_logic.heights[column] == 10
+
+    # ペアを置いた後は、待たせていた分も次に落とすときに落とす（お邪魔ぷよの落下アニメーションは終わったことにする）
+    game_logic.fall_animation_in_progress = False
+    game_logic.apply_action(puyo_core.ACTION_DROP)
+    assert game_logic.heights == board_heights(game_logic)
+    assert game_logic.heights[column] == 12
+    game_logic.fall_animation_in_progress = False
+    game_logic.drop_ojama_puyos()
+    assert game_logic.pending_ojama == 0
+    assert game_logic.heights == board_heights(game_logic)
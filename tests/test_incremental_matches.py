@@ -0,0 +1,65 @@
+# 変化したマスからだけ探すグループ探索が、盤面全体の探索と同じ結果になるか
+import pytest
+
+import puyo_core
+from puyo_bitboard import GRID_HEIGHT, cell_bit
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_seeded_find_groups_matches_full_scan(random_board, seed):
+    board = random_board(seed)
+    # 1つおきの連結成分から1マスずつを変化したマスにする
+    seeds = 0
+    for _, mask in board.find_groups(min_size=1)[::2]:
+        seeds |= mask & -mask
+
+    # 全体の探索で見つかるグループのうち、変化したマスを含むものだけが返る
+    expected = [(color, mask) for color, mask in board.find_groups() if mask & seeds]
+    assert sorted(board.find_groups(seeds=seeds)) == sorted(expected)
+    assert sorted(board.find_groups(seeds=board.occupied)) == sorted(board.find_groups())
+
+
+def test_seeded_find_groups_ignores_group_next_to_seed(board_from_rows):
+    # 変化したマス（Y）に隣接していても、それを含まないグループ（R）は返さない
+    board = board_from_rows((
+        "RRRRY.",
+        "GGGBBB",
+    ))
+    yellow = cell_bit(4, GRID_HEIGHT - 2)
+    assert board.find_groups(seeds=yellow) == []
+    # グループの端の1マスだけが変化していれば、グループ全体が返る
+    red_end = cell_bit(3, GRID_HEIGHT - 2)
+    assert board.find_groups(seeds=red_end) == board.find_groups(seeds=board.occupied)
+
+
+class VerifiedGameLogic(puyo_core.PuyoGameLogic):
+    verify_matches = True  # 食い違えば check_matches() が RuntimeError を出す
+
+
+def test_chain_through_cleared_ojama(board_from_rows, logic_with_board):
+    # Gが消えると隣のお邪魔ぷよも消え、その上のRが落ちて、変化していない3つのRとつながる
+    game_logic = logic_with_board(VerifiedGameLogic(seed=0), board_from_rows((
+        "...R..",
+        "...O.G",
+        "RRRGGG",
+    )))
+    game_logic.touched = cell_bit(5, GRID_HEIGHT - 2)  # 最後に置いたG
+    assert game_logic.check_matches()
+    assert game_logic.fall_puyos() == [(3, GRID_HEIGHT - 1, 2)]
+    assert game_logic.check_matches()
+    assert game_logic.chain_count == 2
+    assert not game_logic.board.occupied
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_incremental_check_matches_in_match(seed):
+    # 着地・落下・お邪魔ぷよ・連鎖を含む実際の対戦で、毎回の check_matches() を全体の探索と照合する
+    p1 = VerifiedGameLogic(seed=seed)
+    p2 = VerifiedGameLogic(is_player2=True, opponent=p1, seed=seed)
+    p1.opponent = p2
+    ai_players = (puyo_core.AIPlayer(p1, seed=seed), puyo_core.AIPlayer(p2, seed=seed + 1))
+    for _ in range(6000):
+        if p1.game_over or p2.game_over:
+            break
+        puyo_core.step_match((p1, p2), ai_players)
+    assert p1.score + p2.score > 0
@@ -0,0 +1,37 @@
+# place_pair（AIが読む盤面）が実際のゲームでペアを落とした結果と同じになるか
+import pytest
+
+import puyo_bench
+import puyo_core
+from puyo_bitboard import GRID_WIDTH
+
+
+def drop_pair(game_logic, column, rotation):
+    """今のペアを回してから列まで動かして落とし、次のペアが出るまで進める"""
+    for _ in range(rotation):
+        assert game_logic.apply_action(puyo_core.ACTION_ROTATE_CW)
+    while game_logic.current_pair.x != column:
+        assert game_logic.apply_action(puyo_core.ACTION_RIGHT if column > game_logic.current_pair.x else puyo_core.ACTION_LEFT)
+    tsumo_index = game_logic.tsumo_index
+    game_logic.apply_action(puyo_core.ACTION_DROP)
+    while game_logic.tsumo_index == tsumo_index:
+        game_logic.step(puyo_core.LOGIC_DT)
+
+
+@pytest.mark.parametrize("fixture", ["empty", "sparse", "chain"])
+@pytest.mark.parametrize("rotation", range(4))
+def test_place_pair_matches_live_drop(fixture, rotation):
+    for column in range(GRID_WIDTH):
+        game_logic = puyo_bench.make_logic(puyo_bench.FIXTURES[fixture])
+        pair = game_logic.current_pair
+        pair.colors = [0, 1]  # 縦置きの上下が入れ替わると結果が変わるよう別の色にする
+        pair.puyo1.color, pair.puyo2.color = pair.colors
+        before = game_logic.board.copy()
+        placed = puyo_core.place_pair(before, column, rotation, 0, 1)
+        if placed is None or puyo_core.pair_mask(column, 0, rotation) is None:
+            continue
+        drop_pair(game_logic, column, rotation)
+        assert puyo_core.resolve_chain(placed[0]).board.colors == game_logic.board.colors, (column, rotation)
+        # 列の高さから落下位置を決めても同じ盤面になる
+        heights = [before.column_height(x) for x in range(GRID_WIDTH)]
+        assert puyo_core.place_pair(before, column, rotation, 0, 1, heights)[0].colors == placed[0].colors
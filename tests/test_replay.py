@@ -0,0 +1,50 @@
+# 記録したリプレイを再生すると、記録したときと同じ対戦になるか
+import puyo_core
+import puyo_replay
+
+FRAMES = 3000
+
+
+def record_match(seed, frames=FRAMES):
+    """AI同士の対戦を画面と同じ順番で進めながら記録し、(記録, ゲームロジックのリスト) を返す"""
+    recorder = puyo_replay.ReplayRecorder(players=2)
+    p1 = puyo_core.PuyoGameLogic(seed=seed)
+    p2 = puyo_core.PuyoGameLogic(is_player2=True, opponent=p1, seed=seed)
+    p1.opponent = p2
+    recorder.attach(p1)
+    recorder.attach(p2)
+    ai_players = (puyo_core.AIPlayer(p1, seed=seed), puyo_core.AIPlayer(p2, search_depth=2, seed=seed + 1))
+    for _ in range(frames):
+        recorder.tick(puyo_core.LOGIC_STEP_US)
+        puyo_core.step_match((p1, p2), ai_players, puyo_core.LOGIC_DT)
+    return recorder.to_bytes(), [p1, p2]
+
+
+def state(game_logic):
+    return (game_logic.board.colors, game_logic.score, game_logic.tsumo_index, game_logic.pending_ojama,
+            game_logic.game_over, game_logic.current_pair.x, game_logic.current_pair.y, game_logic.current_pair.rotation)
+
+
+def test_replay_round_trip():
+    data, live = record_match(7)
+    players, events = puyo_replay.read_replay(data)
+    assert players == 2
+    assert sum(kind == puyo_replay.EVENT_ACTION for kind, _, _ in events) > 0
+
+    logics, frames = puyo_replay.play_replay((players, events))
+    assert frames == FRAMES
+    assert [state(game_logic) for game_logic in logics] == [state(game_logic) for game_logic in live]
+    assert [game_logic.seed for game_logic in logics] == [game_logic.seed for game_logic in live]
+
+
+def test_replay_keeps_recording_restarts():
+    # ゲームオーバー後のリスタートも記録され、新しいツモ表で再生される
+    recorder = puyo_replay.ReplayRecorder(players=1)
+    game_logic = puyo_core.PuyoGameLogic(seed=3)
+    recorder.attach(game_logic)
+    game_logic.game_over = True
+    game_logic.apply_action(puyo_core.ACTION_RESTART)
+    _, events = puyo_replay.read_replay(recorder.to_bytes())
+    resets = [value for kind, _, value in events if kind == puyo_replay.EVENT_RESET]
+    assert [seed for seed, _ in resets] == [3, game_logic.seed]
+    assert resets[-1][1] == game_logic.tsumo.pairs
@@ -0,0 +1,77 @@
+# resolve_chain（アニメーションなしの連鎖計算）がゲームロジックの連鎖と同じ結果になるか
+import pytest
+
+import puyo_bench
+import puyo_core
+from puyo_bitboard import GRID_HEIGHT, cell_bit
+
+
+def new_logic():
+    game_logic = puyo_core.PuyoGameLogic(seed=0)
+    game_logic.opponent = puyo_core.PuyoGameLogic(is_player2=True, seed=0)
+    return game_logic
+
+
+def run_chain(game_logic):
+    """落下と check_matches() を連鎖が終わるまで繰り返し、(連鎖数, 得点, 送ったお邪魔ぷよ数) を返す"""
+    chain = 0
+    while True:
+        game_logic.fall_puyos()
+        if not game_logic.check_matches():
+            return chain, game_logic.score, game_logic.opponent.pending_ojama
+        chain = game_logic.chain_count
+
+
+def assert_same_chain(game_logic):
+    before = game_logic.board.copy()
+    result = puyo_core.resolve_chain(game_logic.board)
+    assert game_logic.board.colors == before.colors  # 渡した盤面は変更しない
+
+    chain, score, ojama = run_chain(game_logic)
+    assert result.chain_length == chain
+    assert result.score == score
+    assert result.ojama == ojama
+    assert result.board.colors == game_logic.board.colors
+    assert result.board.zobrist == game_logic.board.zobrist
+    return result
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_resolve_chain_matches_stepped_check_matches(random_board, logic_with_board, seed):
+    # 浮いたぷよやお邪魔ぷよを混ぜたランダムな盤面
+    assert_same_chain(logic_with_board(new_logic(), random_board(seed, ojama=0.1, holes=0.1, max_height=8)))
+
+
+def test_resolve_chain_clears_ojama_next_to_pop(board_from_rows, logic_with_board):
+    # Gと一緒に隣のお邪魔ぷよが消え、その上のRが落ちて2連鎖になる（お邪魔ぷよは攻撃の数に入らない）
+    result = assert_same_chain(logic_with_board(new_logic(), board_from_rows((
+        "...R..",
+        "...O.G",
+        "RRRGGG",
+    ))))
+    assert result.chain_length == 2
+    assert result.steps[0].ojama_mask == cell_bit(3, GRID_HEIGHT - 2)
+    assert not result.board.occupied
+
+
+def test_resolve_chain_settles_floating_puyos_first(board_from_rows, logic_with_board):
+    # 浮いているRが落ちてから4つつながる
+    result = assert_same_chain(logic_with_board(new_logic(), board_from_rows((
+        "R.....",
+        "......",
+        "RRR...",
+    ))))
+    assert result.chain_length == 1
+
+
+def test_resolve_chain_long_chain():
+    game_logic = puyo_bench.load_fixture(new_logic(), puyo_bench.CHAIN_ROWS)
+    assert assert_same_chain(game_logic).chain_length == 8
+
+
+def test_resolve_chain_uses_transposition_table(random_board):
+    board = random_board(1, ojama=0.1, holes=0.1, max_height=8)
+    table = puyo_core.TranspositionTable()
+    first = puyo_core.resolve_chain(board, table=table)
+    assert puyo_core.resolve_chain(board, table=table) is first
+    assert table.hits == 1
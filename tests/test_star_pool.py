@@ -0,0 +1,49 @@
+# 星エフェクトのリングバッファ（StarPool）
+import puyo_core
+
+
+def positions(pool):
+    return [(x, y) for x, y, _, _, _ in pool]
+
+
+def test_star_pool_wraps_and_evicts_oldest():
+    pool = puyo_core.StarPool(capacity=3, duration=1.0)
+    assert [pool.add(i, 0, 0, 2) for i in range(3)] == [None, None, None]
+    # いっぱいになったら一番古い星を上書きし、その位置を返す
+    assert pool.add(3, 0, 1, 2) == (0, 0)
+    assert pool.add(4, 0, 1, 2) == (1, 0)
+    assert len(pool) == 3
+    assert positions(pool) == [(2, 0), (3, 0), (4, 0)]
+    # 先頭が配列の途中にあっても古い順に返す
+    assert pool.head == 2
+    assert [color for _, _, color, _, _ in pool] == [0, 1, 1]
+
+
+def test_star_pool_with_zero_capacity_shows_nothing():
+    pool = puyo_core.StarPool(capacity=0)
+    assert pool.add(1, 2, 0, 3) is None
+    dirty = []
+    pool.update(1.0, lambda x, y: dirty.append((x, y)))
+    assert len(pool) == 0
+    assert list(pool) == []
+    assert dirty == []
+
+
+def test_star_pool_expires_oldest_first_and_marks_dirty():
+    pool = puyo_core.StarPool(capacity=4, duration=1.0)
+    pool.add(0, 0, 0, 2)
+    pool.update(0.5, lambda x, y: None)
+    pool.add(1, 0, 0, 2)
+    # 残り時間は追加した時刻からの経過で減る
+    assert [round(left, 6) for _, _, _, left, _ in pool] == [0.5, 1.0]
+
+    dirty = []
+    pool.update(0.5, lambda x, y: dirty.append((x, y)))
+    assert dirty == [(0, 0), (1, 0)]  # 消える星も含めて、出ていた星の位置を描き直す
+    assert positions(pool) == [(1, 0)]
+
+    pool.update(0.5, lambda x, y: None)
+    assert len(pool) == 0
+    # 空になった後も続けて使える（先頭がずれていても追加できる）
+    pool.add(5, 5, 3, 4)
+    assert list(pool) == [(5, 5, 3, 1.0, 4)]
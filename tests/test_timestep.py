@@ -0,0 +1,94 @@
+# 固定長のティック（FixedTimestep）: 実時間からのティック数・追いつける上限・描画の補間
+import pytest
+
+import puyo_core
+
+STEP_US = puyo_core.LOGIC_STEP_US
+
+
+class FakeClock:
+    """進めた分だけ時刻が進む時計（秒）"""
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def test_first_frame_runs_one_tick():
+    timestep = puyo_core.FixedTimestep(clock=FakeClock())
+    assert timestep.frame() == 1
+    assert timestep.alpha == 0.0
+
+
+@pytest.mark.parametrize("fps, ticks_per_second", [(60, 60), (144, 60), (30, 60)])
+def test_ticks_follow_real_time_not_frame_rate(fps, ticks_per_second):
+    clock = FakeClock()
+    timestep = puyo_core.FixedTimestep(clock=clock)
+    timestep.frame()
+    ticks = 0
+    for _ in range(fps * 10):
+        clock.advance(1 / fps)
+        ticks += timestep.frame()
+    # 10秒でほぼ 600 ティック（端数は次のティックまでの時間として残る）
+    assert abs(ticks - ticks_per_second * 10) <= 1
+    assert 0.0 <= timestep.alpha < 1.0
+
+
+def test_alpha_is_progress_to_next_tick():
+    clock = FakeClock()
+    timestep = puyo_core.FixedTimestep(clock=clock)
+    timestep.frame()
+    clock.advance(STEP_US / 2 / 1000000)
+    assert timestep.frame() == 0
+    assert timestep.alpha == pytest.approx(0.5, abs=1e-4)
+    clock.advance(STEP_US / 1000000)
+    assert timestep.frame() == 1
+    assert timestep.alpha == pytest.approx(0.5, abs=1e-4)
+
+
+def test_catch_up_is_limited_after_a_stall():
+    clock = FakeClock()
+    timestep = puyo_core.FixedTimestep(clock=clock)
+    timestep.frame()
+    clock.advance(2.0)  # 2秒止まっていた
+    assert timestep.frame() == puyo_core.MAX_TICKS_PER_FRAME
+    assert timestep.alpha == 0.0  # 追いつけない分は捨てる
+    clock.advance(STEP_US / 1000000)
+    assert timestep.frame() == 1
+
+
+def test_clock_going_backwards_runs_no_ticks():
+    clock = FakeClock()
+    timestep = puyo_core.FixedTimestep(clock=clock)
+    timestep.frame()
+    clock.advance(-1.0)
+    assert timestep.frame() == 0
+    assert timestep.alpha == 0.0
+
+
+def run_frames(fps, ticks):
+    """描画の速さ fps で、ロジックが ticks 回進むまでフレームを回した対戦"""
+    clock = FakeClock()
+    timestep = puyo_core.FixedTimestep(clock=clock)
+    p1 = puyo_core.PuyoGameLogic(seed=5)
+    p2 = puyo_core.PuyoGameLogic(is_player2=True, opponent=p1, seed=5)
+    p1.opponent = p2
+    ai_players = (puyo_core.AIPlayer(p1, seed=1), puyo_core.AIPlayer(p2, seed=2))
+    done = 0
+    while done < ticks:
+        for _ in range(min(timestep.frame(), ticks - done)):
+            puyo_core.step_match((p1, p2), ai_players)
+            done += 1
+        clock.advance(1 / fps)
+    return [(p.score, p.board.zobrist, p.tsumo_index) for p in (p1, p2)]
+
+
+def test_game_state_does_not_depend_on_frame_rate():
+    # 同じティック数まで進めれば、描画の速さが違っても同じ対戦になる
+    states = [run_frames(fps, 3000) for fps in (30, 60, 144)]
+    assert states[0] == states[1] == states[2]
+    assert states[0][0][2] > 2  # ぷよを置いている